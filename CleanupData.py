@@ -1,41 +1,79 @@
-import pandas as pd
+import sys
+
+import instrumentation
 
 
 def read_csv_list(filename):
     with open(filename, "r") as f:
         return [line.strip() for line in f if line.strip()]
 
-lastname_filter = set(read_csv_list("lastnames_new.csv"))
 
-townnames = read_csv_list("townnames.csv")
+def prepare_lastnames(lastname_filter):
+    """Lower-case the filter once; returns (name, lowered) pairs in iteration order."""
+    return [(name, name.lower()) for name in lastname_filter]
+
+
+def match_lastname(grantor, grantee, prepared):
+    """Return the first name whose lower-case form is in grantor or grantee, else ''."""
+    grantor = str(grantor).lower()
+    grantee = str(grantee).lower()
+    for name, lname in prepared:
+        if lname in grantor or lname in grantee:
+            return name
+    return ''
+
 
-for town in townnames:
-    input_file = f"Data/{town}.csv"
-    output_file = f"Data/{town}_filtered.csv"
-    try:
-        df = pd.read_csv(input_file)
-    except FileNotFoundError:
-        print(f"File not found: {input_file}")
-        continue
+def filter_by_lastname(df, lastname_filter):
+    """Drop repeated header rows and keep rows whose 1st Grantor or 1st Grantee
+    contains any name in lastname_filter. Adds a 'Matched Lastname' column."""
+    import pandas as pd
     # Remove leading/trailing whitespace from column names
     df.columns = df.columns.str.strip()
     # Remove rows where 'View Doc' == 'View Doc' and 'Doc Number' == 'Doc Number'
     df = df[~((df['View Doc'] == 'View Doc') & (df['Doc Number'] == 'Doc Number'))]
     # Filter rows where any part of lastname_filter is in 1st Grantor or 1st Grantee
-    def get_matching_name(row):
-        grantor = str(row['1st Grantor']).lower()
-        grantee = str(row['1st Grantee']).lower()
-        for name in lastname_filter:
-            lname = name.lower()
-            if lname in grantor or lname in grantee:
-                return name
-        return ''
-
-    mask = (
-        df['1st Grantor'].apply(lambda x: any(name.lower() in str(x).lower() for name in lastname_filter)) |
-        df['1st Grantee'].apply(lambda x: any(name.lower() in str(x).lower() for name in lastname_filter))
-    )
+    prepared = prepare_lastnames(lastname_filter)
+    matched = [match_lastname(grantor, grantee, prepared)
+               for grantor, grantee in zip(df['1st Grantor'], df['1st Grantee'])]
+    # a Series, not a list: df[[]] would select zero columns instead of zero rows
+    mask = pd.Series([m != '' for m in matched], index=df.index, dtype=bool)
     filtered = df[mask].copy()
-    filtered['Matched Lastname'] = filtered.apply(get_matching_name, axis=1)
-    filtered.to_csv(output_file, index=False)
-    print(f"Filtered and saved: {output_file}")
\ No newline at end of file
+    filtered['Matched Lastname'] = [m for m in matched if m]
+    return filtered
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Filter Data/<town>.csv by lastname into Data/<town>_filtered.csv')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure_from_args('CleanupData', args)
+
+    import pandas as pd
+
+    lastname_filter = set(read_csv_list("lastnames_new.csv"))
+
+    townnames = read_csv_list("townnames.csv")
+
+    for town in townnames:
+        input_file = f"Data/{town}.csv"
+        output_file = f"Data/{town}_filtered.csv"
+        try:
+            with instrumentation.stage("read_csv"):
+                df = pd.read_csv(input_file)
+        except FileNotFoundError:
+            print(f"File not found: {input_file}")
+            continue
+        with instrumentation.stage("filter"):
+            filtered = filter_by_lastname(df, lastname_filter)
+        instrumentation.count_rows("filter", rows_in=len(df), rows_out=len(filtered))
+        with instrumentation.stage("write_csv"):
+            filtered.to_csv(output_file, index=False)
+        print(f"Filtered and saved: {output_file}")
+
+    instrumentation.finish()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,15 +1,15 @@
-import requests
-from fastkml import kml
-import requests
-from shapely.geometry import Point, Polygon
 import xml.etree.ElementTree as ET
 import time
 import csv
 import json
 import os
+import sys
+
+import instrumentation
 
 
 def get_boundary_polygon(area_kml_path):
+    from shapely.geometry import Polygon
     tree = ET.parse(area_kml_path)
     root = tree.getroot()
     ns = {'kml': 'http://www.opengis.net/kml/2.2'}
@@ -75,7 +75,7 @@ def get_address_placemarks(points_kml_path):
     if hrefs:
         for href in hrefs:
             try:
-                resp = requests.get(href, timeout=15)
+                resp = instrumentation.get(href, timeout=15)
                 resp.raise_for_status()
                 placemarks.extend(parse_placemarks_from_kml_string(resp.text))
             except Exception as e:
@@ -122,11 +122,40 @@ def normalize_address(addr):
     return s
 
 
+def placemark_address(p):
+    """Address string for a placemark: <address>, else joined ExtendedData fields."""
+    addr = p.get('address_tag') or ''
+    if not addr:
+        ext = p.get('extended', {})
+        parts = []
+        for key in ('Address Line 1', 'City', 'Town', '1st PIN'):
+            v = ext.get(key)
+            if v:
+                parts.append(v.strip())
+        addr = ', '.join(parts)
+    return addr
+
+
+def lookup_clustering(name, addr, by_name_map, by_addr_map):
+    """Look a placemark up in the clustering CSV maps, by placemark name first
+    and then by normalized address. Returns (lon, lat, 'name'|'addr') or None."""
+    if name and str(name).strip() in by_name_map:
+        lon, lat = by_name_map[str(name).strip()]
+        return lon, lat, 'name'
+    norm = normalize_address(addr)
+    if norm in by_addr_map:
+        lon, lat = by_addr_map[norm]
+        return lon, lat, 'addr'
+    return None
+
+
 def geocode_address(address, cache, email=None):
     if not address:
         return None, None
     if address in cache:
+        instrumentation.cache_hit('geocode_cache')
         return cache[address]
+    instrumentation.cache_miss('geocode_cache')
     url = 'https://nominatim.openstreetmap.org/search'
     params = {'q': address, 'format': 'json', 'limit': 1}
     ua = 'FindPointsInArea/1.0'
@@ -134,7 +163,7 @@ def geocode_address(address, cache, email=None):
         ua = ua + f' ({email})'
     headers = {'User-Agent': ua}
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=10)
+        resp = instrumentation.get(url, params=params, headers=headers, timeout=10)
         resp.raise_for_status()
         data = resp.json()
         if data:
@@ -166,6 +195,29 @@ def save_geocode_cache(path, cache):
         print(f'Failed to save geocode cache: {e}')
 
 
+def filter_points_in_boundary(placemarks, boundary_polygon, prepared=None, verbose=True):
+    """Return placemarks whose coordinates fall inside boundary_polygon.
+    A cheap bounding-box check runs first so only candidates hit shapely.
+    Pass a shapely prepared geometry as `prepared` when testing the same
+    boundary repeatedly.
+    """
+    from shapely.geometry import Point
+    minx, miny, maxx, maxy = boundary_polygon.bounds
+    in_bbox = []
+    for p in placemarks:
+        lon = p.get('lon')
+        lat = p.get('lat')
+        if lon is None or lat is None:
+            continue
+        if minx <= lon <= maxx and miny <= lat <= maxy:
+            in_bbox.append(p)
+    if verbose:
+        print(f'Placemarks within bounding box: {len(in_bbox)}')
+
+    covers = (prepared or boundary_polygon).covers
+    return [p for p in in_bbox if covers(Point(p.get('lon'), p.get('lat')))]
+
+
 def write_kml_with_points(placemarks, output_path):
     ns = 'http://www.opengis.net/kml/2.2'
     kml_el = ET.Element(f'{{{ns}}}kml')
@@ -194,15 +246,23 @@ def write_kml_with_points(placemarks, output_path):
     tree.write(output_path, encoding='utf-8', xml_declaration=True)
 
 
-if __name__ == '__main__':
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Find pocket addresses that fall inside a boundary KML')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure_from_args('FindPointsInArea', args)
+
     area_kml = 'Data/DesPlainesKendraArea.kml'
     points_kml = 'Data/DesplainesPocketPoints.kml'
     cache_path = 'geocode_cache.json'
     max_geocode_sample = None  # number of missing coords to geocode; None => all
     email = None  # set to your contact email for Nominatim policy compliance
 
-    boundary_polygon = get_boundary_polygon(area_kml)
-    all_placemarks = get_address_placemarks(points_kml)
+    with instrumentation.stage('load_boundary'):
+        boundary_polygon = get_boundary_polygon(area_kml)
+    with instrumentation.stage('load_placemarks'):
+        all_placemarks = get_address_placemarks(points_kml)
     print(f'Total placemarks found: {len(all_placemarks)}')
 
     # Load cache
@@ -210,7 +270,8 @@ if __name__ == '__main__':
 
     # Load clustering CSV maps
     clustering_csv = 'Data/Desplaines Clustering.csv'
-    by_name_map, by_addr_map = load_clustering_csv(clustering_csv)
+    with instrumentation.stage('load_clustering_csv'):
+        by_name_map, by_addr_map = load_clustering_csv(clustering_csv)
 
     # Find placemarks missing coordinates
     missing = [p for p in all_placemarks if p.get('lon') is None or p.get('lat') is None]
@@ -220,38 +281,22 @@ if __name__ == '__main__':
     sample = missing[:max_geocode_sample] if max_geocode_sample else missing
     for p in sample:
         # build an address string: prefer <address>, else use ExtendedData fields
-        addr = p.get('address_tag') or ''
-        if not addr:
-            ext = p.get('extended', {})
-            parts = []
-            for key in ('Address Line 1', 'City', 'Town', '1st PIN'):
-                v = ext.get(key)
-                if v:
-                    parts.append(v.strip())
-            addr = ', '.join(parts)
+        addr = placemark_address(p)
         if not addr:
             continue
-        # Try clustering CSV by placemark_name first
-        used = False
+        # Try clustering CSV by placemark_name first, then normalized address
         pm_name = p.get('name')
-        if pm_name and str(pm_name).strip() in by_name_map:
-            lon, lat = by_name_map[str(pm_name).strip()]
+        found = lookup_clustering(pm_name, addr, by_name_map, by_addr_map)
+        if found:
+            lon, lat, how = found
             p['lon'] = lon
             p['lat'] = lat
-            print(f"Used clustering CSV (name): {pm_name} -> {lon},{lat}")
-            used = True
-        else:
-            # try normalized address match
-            norm = normalize_address(addr)
-            if norm in by_addr_map:
-                lon, lat = by_addr_map[norm]
-                p['lon'] = lon
-                p['lat'] = lat
-                print(f"Used clustering CSV (addr): {addr} -> {lon},{lat}")
-                used = True
-        if used:
+            print(f"Used clustering CSV ({how}): {pm_name if how == 'name' else addr} -> {lon},{lat}")
+            instrumentation.cache_hit('clustering_csv')
             continue
-        lonlat = geocode_address(addr, cache, email=email)
+        instrumentation.cache_miss('clustering_csv')
+        with instrumentation.stage('geocode'):
+            lonlat = geocode_address(addr, cache, email=email)
         if lonlat and lonlat != (None, None):
             lon, lat = lonlat
             p['lon'] = lon
@@ -259,24 +304,24 @@ if __name__ == '__main__':
             print(f"Geocoded: {addr} -> {lon},{lat}")
         else:
             print(f"Geocode failed for: {addr}")
-        time.sleep(1.1)
+        with instrumentation.stage('sleep'):
+            time.sleep(1.1)
 
     save_geocode_cache(cache_path, cache)
 
     # Now filter by bbox and polygon
-    minx, miny, maxx, maxy = boundary_polygon.bounds
-    in_bbox = []
-    for p in all_placemarks:
-        lon = p.get('lon')
-        lat = p.get('lat')
-        if lon is None or lat is None:
-            continue
-        if minx <= lon <= maxx and miny <= lat <= maxy:
-            in_bbox.append(p)
-    print(f'Placemarks within bounding box: {len(in_bbox)}')
-
-    inside = [p for p in in_bbox if boundary_polygon.covers(Point(p.get('lon'), p.get('lat')))]
+    with instrumentation.stage('filter'):
+        inside = filter_points_in_boundary(all_placemarks, boundary_polygon)
+    instrumentation.count_rows('filter', rows_in=len(all_placemarks), rows_out=len(inside))
     print(f'Found {len(inside)} addresses inside the boundary')
 
-    write_kml_with_points(inside, 'Data/AddressesWithinBoundary.kml')
-    print('Wrote Data/AddressesWithinBoundary.kml')
\ No newline at end of file
+    with instrumentation.stage('write_kml'):
+        write_kml_with_points(inside, 'Data/AddressesWithinBoundary.kml')
+    print('Wrote Data/AddressesWithinBoundary.kml')
+
+    instrumentation.finish()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,25 +1,46 @@
-import pandas as pd
+import sys
+
+import instrumentation
 
 def read_csv_list(filename):
     with open(filename, "r") as f:
         return [line.strip() for line in f if line.strip()]
 
-townnames = read_csv_list("townnames.csv")
-
-frames = []
-for town in townnames:
-    input_file = f"Data/{town}_filtered.csv"
-    try:
-        df = pd.read_csv(input_file)
-        df['Town'] = town  # Optionally add a column to identify the town
-        frames.append(df)
-    except FileNotFoundError:
-        print(f"File not found: {input_file}")
-        continue
-
-if frames:
-    combined = pd.concat(frames, ignore_index=True)
-    combined.to_csv("Data/all_towns_combined.csv", index=False)
-    print("Combined file saved as all_towns_combined.csv")
-else:
-    print("No files to combine.")
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Combine Data/<town>_filtered.csv files into Data/all_towns_combined.csv')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure_from_args('combine_filtered', args)
+
+    import pandas as pd
+
+    townnames = read_csv_list("townnames.csv")
+
+    frames = []
+    for town in townnames:
+        input_file = f"Data/{town}_filtered.csv"
+        try:
+            with instrumentation.stage("read_csv"):
+                df = pd.read_csv(input_file)
+            df['Town'] = town  # Optionally add a column to identify the town
+            frames.append(df)
+        except FileNotFoundError:
+            print(f"File not found: {input_file}")
+            continue
+
+    if frames:
+        with instrumentation.stage("concat"):
+            combined = pd.concat(frames, ignore_index=True)
+        instrumentation.count_rows("concat", rows_in=sum(len(df) for df in frames), rows_out=len(combined))
+        with instrumentation.stage("write_csv"):
+            combined.to_csv("Data/all_towns_combined.csv", index=False)
+        print("Combined file saved as all_towns_combined.csv")
+    else:
+        print("No files to combine.")
+
+    instrumentation.finish()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,77 @@
+"""
+Shared pytest fixtures: a fake clerk search site served through instrumentation.get,
+so crawls run without the network.
+"""
+from html import escape
+
+import pytest
+
+import instrumentation
+from getContactDetails import query_url
+
+SITE = 'https://crs.cookcountyclerkil.gov'
+HEADER = ['', 'View Doc', 'Doc Number', 'Doc Recorded', 'Doc Executed', 'Doc Type',
+          '1st Grantor', '1st Grantee', 'Assoc. Doc#', '1st PIN']
+
+
+class FakeResponse:
+    def __init__(self, url, status_code, text):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f'{self.status_code} Error for url: {self.url}', response=self)
+
+
+def result_page(docs, lastname, next_href=None):
+    """HTML result page with one row per (doc number, recorded date)."""
+    body = ''.join(
+        '<tr>' + ''.join(f'<td>{escape(c)}</td>' for c in
+                         ['', 'View', doc, recorded, '', 'DEED', f'{lastname.upper()} A', 'SMITH B', '',
+                          '01-02-345-678-0000' + '5 BOLAND DR']) + '</tr>'
+        for doc, recorded in docs)
+    head = ''.join(f'<th>{escape(h)}</th>' for h in HEADER)
+    nxt = f'<a rel="next" href="{escape(next_href)}">Next</a>' if next_href else ''
+    return (f'<html><body><table id="tblData"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+            f'<div class="pager">{nxt}</div></body></html>')
+
+
+class FakeSite:
+    """Result pages keyed by URL. add_query() lays out the pages of one search;
+    set_status() makes one of them answer with an HTTP error instead."""
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+
+    @staticmethod
+    def page_url(town, lastname, page=1):
+        url = query_url(town, lastname)
+        return url if page == 1 else f'{url}&page={page}'
+
+    def add_query(self, town, lastname, pages):
+        """pages: one list of (doc number, 'YYYY-MM-DD') per result page; [] for no results."""
+        self.pages[self.page_url(town, lastname)] = (200, '<html><body>No results</body></html>')
+        for i, docs in enumerate(pages, 1):
+            nxt = self.page_url(town, lastname, i + 1)[len(SITE):] if i < len(pages) else None
+            self.pages[self.page_url(town, lastname, i)] = (200, result_page(docs, lastname, nxt))
+
+    def set_status(self, town, lastname, page, status):
+        url = self.page_url(town, lastname, page)
+        self.pages[url] = (status, self.pages.get(url, (200, ''))[1])
+
+    def get(self, url, **kwargs):
+        self.requests.append(url)
+        status, text = self.pages.get(url, (404, 'Not found'))
+        return FakeResponse(url, status, text)
+
+
+@pytest.fixture
+def site(monkeypatch):
+    fake = FakeSite()
+    monkeypatch.setattr(instrumentation, 'get', fake.get)
+    instrumentation.configure('test', trace_memory=False)
+    return fake
@@ -0,0 +1,235 @@
+"""
+Pipelined crawl for getContactDetails.py: fetch, parse and write run concurrently.
+
+    fetch threads --(html_queue, bounded)--> parse processes --(write_queue, bounded)--> writer thread
+
+- Fetch threads download result pages. They block when html_queue is full, so at most
+  `queue_size` raw pages wait in memory.
+- The calling thread hands pages to a process pool running getContactDetails.parse_page
+  (BeautifulSoup is CPU bound and holds the GIL). At most `parsers * 2` pages are in
+  flight. A parsed page's next-page URL goes back to the fetch threads.
+- A single writer thread owns the <town>.csv files and flushes rows in batches.
+
+Pages of one query are fetched in order, but different queries interleave, so rows of
+a town file are not grouped by lastname the way the sequential crawl writes them. Each
+page's rows are written together, and every page starts with its table header row, so
+CleanupData.py reads the result the same way.
+
+With a crawl_state.CrawlState, every page goes through the query's tracker. With
+refresh=True, only new documents are written (appended to the town files) and a query
+stops paging once it reaches known documents.
+
+At the end, each stage's busy time, utilization and time spent blocked on the next stage
+are printed and added to the instrumentation report.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import csv
+import os
+import queue
+import threading
+import time
+
+import instrumentation
+from crawl_state import known_docs_in_csv, needs_header
+from getContactDetails import REQUEST_TIMEOUT, headers, parse_page, query_url
+
+_STOP = object()
+
+
+class StageClock:
+    """Busy/blocked seconds summed over the workers of one stage."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def add(self, busy=0.0, blocked=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.blocked += blocked
+            self.items += items
+
+    def summary(self, wall):
+        capacity = wall * self.workers
+        return {
+            'workers': self.workers,
+            'items': self.items,
+            'busy_seconds': self.busy,
+            'blocked_seconds': self.blocked,
+            'utilization': self.busy / capacity if capacity else 0.0,
+        }
+
+
+def _timed_parse(html):
+    start = time.perf_counter()
+    return parse_page(html), time.perf_counter() - start
+
+
+def _put(q, item, clock):
+    start = time.perf_counter()
+    q.put(item)
+    clock.add(blocked=time.perf_counter() - start)
+
+
+def _fetcher(fetch_queue, html_queue, clock):
+    while True:
+        task = fetch_queue.get()
+        if task is _STOP:
+            return
+        start = time.perf_counter()
+        try:
+            response = instrumentation.get(task['url'], headers=headers, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            html = response.text
+        except Exception as e:
+            print(f"Fetch failed for {task['url']}: {e}")
+            html = None
+        clock.add(busy=time.perf_counter() - start, items=1)
+        _put(html_queue, (task, html), clock)
+
+
+def _writer(write_queue, files, batch_size, clock):
+    buffers = {town: [] for town in files}
+
+    def flush(town):
+        start = time.perf_counter()
+        files[town][1].writerows(buffers[town])
+        buffers[town] = []
+        clock.add(busy=time.perf_counter() - start)
+
+    while True:
+        item = write_queue.get()
+        if item is _STOP:
+            break
+        town, rows = item
+        buffers[town].extend(rows)
+        clock.add(items=len(rows))
+        if len(buffers[town]) >= batch_size:
+            flush(town)
+    for town in files:
+        if buffers[town]:
+            flush(town)
+
+
+def run_pipeline(townnames, lastnames, fetchers=4, parsers=None, queue_size=32, batch_size=500, out_dir='.',
+                 state=None, refresh=False, queries=None):
+    """Crawl every (town, lastname) query into <out_dir>/<town>.csv, or only `queries`
+    (a list of (town, lastname) pairs, in order) when given. Returns the stage summaries."""
+    parsers = parsers or os.cpu_count() or 2
+    fetch_queue = queue.Queue()
+    html_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    clocks = {
+        'fetch': StageClock('fetch', fetchers),
+        'parse': StageClock('parse', parsers),
+        'write': StageClock('write', 1),
+    }
+
+    # the sequential crawl truncates every town file up front (or appends, for a refresh); do the same
+    files = {}
+    header_needed = set()
+    written = {}
+    for town in townnames:
+        path = os.path.join(out_dir, f'{town}.csv')
+        if refresh:
+            if needs_header(path):
+                header_needed.add(town)
+            written[town] = known_docs_in_csv(path)
+        f = open(path, 'a' if refresh else 'w', newline='')
+        files[town] = (f, csv.writer(f))
+
+    trackers = {}
+    outstanding = 0
+    if queries is None:
+        queries = [(town, lastname) for town in townnames for lastname in lastnames]
+    for town, lastname in queries:
+        if state is not None:
+            trackers[(town, lastname)] = state.track(town, lastname, refresh=refresh, written=written.get(town))
+        fetch_queue.put({'town': town, 'lastname': lastname, 'url': query_url(town, lastname), 'page': 1})
+        outstanding += 1
+
+    def query_done(task, ok=True):
+        """ok=False: the query stopped on an error and must not be recorded as complete."""
+        tracker = trackers.pop((task['town'], task['lastname']), None)
+        if tracker is not None:
+            new_docs = tracker.finish() if ok else tracker.fail()
+            if refresh:
+                instrumentation.count_rows('refresh', rows_in=len(tracker.seen), rows_out=new_docs)
+
+    threads = [threading.Thread(target=_fetcher, args=(fetch_queue, html_queue, clocks['fetch']), daemon=True)
+               for _ in range(fetchers)]
+    writer = threading.Thread(target=_writer, args=(write_queue, files, batch_size, clocks['write']), daemon=True)
+    for t in threads + [writer]:
+        t.start()
+
+    start = time.perf_counter()
+    max_in_flight = parsers * 2
+    try:
+        with ProcessPoolExecutor(max_workers=parsers) as pool:
+            pending = {}
+            while outstanding:
+                # top up the pool; block for new pages only when nothing is being parsed. Stop as
+                # soon as no query is left, or the blocking get would wait for a page that never comes
+                while outstanding and len(pending) < max_in_flight:
+                    try:
+                        task, html = html_queue.get(block=not pending)
+                    except queue.Empty:
+                        break
+                    if html is None:
+                        query_done(task, ok=False)
+                        outstanding -= 1
+                        continue
+                    pending[pool.submit(_timed_parse, html)] = task
+                if not pending:
+                    continue
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = pending.pop(future)
+                    try:
+                        (rows, next_url, table_rows), elapsed = future.result()
+                        clocks['parse'].add(busy=elapsed, items=1)
+                    except Exception as e:
+                        print(f"Parse failed for {task['url']}: {e}")
+                        query_done(task, ok=False)
+                        outstanding -= 1
+                        continue
+                    if rows is None:
+                        # no table on the first page means no results; on a later page, a broken crawl
+                        print(f"Document table not found on {task['url']}")
+                        query_done(task, ok=task['page'] == 1)
+                        outstanding -= 1
+                        continue
+                    instrumentation.count_rows('parse', rows_in=table_rows, rows_out=len(rows))
+                    keep_paging = True
+                    tracker = trackers.get((task['town'], task['lastname']))
+                    if tracker is not None:
+                        rows, keep_paging = tracker.page(rows)
+                        if task['town'] in header_needed and tracker.header and rows:
+                            rows = [tracker.header] + rows
+                            header_needed.discard(task['town'])
+                    if rows:
+                        _put(write_queue, (task['town'], rows), clocks['parse'])
+                    if keep_paging and next_url and next_url != task['url']:
+                        fetch_queue.put(dict(task, url=next_url, page=task['page'] + 1))
+                    else:
+                        query_done(task)
+                        outstanding -= 1
+    finally:
+        for _ in threads:
+            fetch_queue.put(_STOP)
+        write_queue.put(_STOP)
+        writer.join()
+        for f, _ in files.values():
+            f.close()
+
+    wall = time.perf_counter() - start
+    summary = {name: clock.summary(wall) for name, clock in clocks.items()}
+    for name, s in summary.items():
+        instrumentation.record_stage(f'pipeline_{name}', s['busy_seconds'], calls=s['items'])
+        print(f"{name:<6} workers={s['workers']:<3} items={s['items']:<8} busy={s['busy_seconds']:.1f}s "
+              f"blocked={s['blocked_seconds']:.1f}s utilization={s['utilization']:.0%}")
+    return summary
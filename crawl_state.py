@@ -0,0 +1,194 @@
+"""
+Per-query crawl state for incremental refreshes of getContactDetails.py.
+
+For every (town, lastname) query, crawl_state.json records the Doc Numbers seen so
+far, the newest `Doc Recorded` date, how many result rows the query has and how many
+pages the last full crawl walked through. A full crawl fills it in. A refresh
+(`getContactDetails.py --refresh`) then writes only rows whose Doc Number is new, and
+stops paging a query once a whole page holds only documents that its own last completed
+crawl returned and that are still in the town CSV. Doc Numbers already in the town CSV
+are never written again, so refreshing files written before crawl_state.json existed (or
+after it was deleted) does not append their rows a second time; but they do not stop the
+paging, because another query or an interrupted crawl may have put them there.
+
+A query that fails part way (HTTP error, timeout, missing table) only adds the documents
+it did see and is marked `incomplete`. Its row and page counts are left as they were, so a
+transient error never looks like a completed crawl, and the next refresh of the query
+pages through to the end instead of stopping at the documents seen before the failure.
+A query without a completed crawl (no `pages`) is paged through to the end as well.
+
+Early stopping assumes that the site lists results newest first. If a page's
+`Doc Recorded` dates are not in descending order, that assumption does not hold for
+the query, and the refresh pages through to the end as a full crawl would. The
+search URL has no date-range parameter we know of, so every query still starts at
+page one.
+"""
+from datetime import datetime
+import csv
+import json
+import os
+import time
+
+# Column positions in the rows produced by getContactDetails.clean_rows
+DOC_NUMBER_COL = 2
+DOC_RECORDED_COL = 3
+
+DEFAULT_STATE = 'crawl_state.json'
+
+
+def parse_doc_date(value):
+    for fmt in ('%Y-%m-%d', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except (ValueError, AttributeError):
+            continue
+    return None
+
+
+def needs_header(path):
+    """True if an appended-to town CSV does not exist yet or is empty."""
+    return not (os.path.exists(path) and os.path.getsize(path))
+
+
+def known_docs_in_csv(path):
+    """Doc Numbers already written to a town CSV (empty if it does not exist)."""
+    docs = set()
+    if not os.path.exists(path):
+        return docs
+    with open(path, 'rt', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if len(row) > DOC_NUMBER_COL and not is_header(row):
+                docs.add(row[DOC_NUMBER_COL])
+    return docs
+
+
+def is_header(row):
+    return len(row) > DOC_NUMBER_COL and row[DOC_NUMBER_COL] == 'Doc Number'
+
+
+class CrawlState:
+    """crawl_state.json: {"<town>|<lastname>": {"docs": [...], "newest": "YYYY-MM-DD",
+    "rows": n, "pages": n, "updated": epoch, "incomplete": true (after a failed crawl)}}"""
+
+    def __init__(self, path=DEFAULT_STATE):
+        self.path = path
+        self.queries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rt', encoding='utf-8') as f:
+                    self.queries = json.load(f)
+            except Exception as e:
+                print(f'Failed to load crawl state {path}: {e}')
+
+    @staticmethod
+    def key(town, lastname):
+        return f'{town}|{lastname}'
+
+    def get(self, town, lastname):
+        return self.queries.get(self.key(town, lastname))
+
+    def track(self, town, lastname, refresh=False, written=None):
+        return QueryTracker(self, town, lastname, refresh, written)
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f'{self.path}.tmp'
+        try:
+            with open(tmp, 'wt', encoding='utf-8') as f:
+                json.dump(self.queries, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f'Failed to save crawl state: {e}')
+
+
+class QueryTracker:
+    """Follows one query's pages. page() returns the rows to write and whether to
+    fetch the next page. finish() folds a completed query back into the state, fail()
+    one that stopped on an error. `written` holds Doc Numbers already in the output
+    file; a refresh writes every other document (so rows missing from the file are
+    restored) and only stops at a page whose documents are all in both `written` and
+    this query's last completed crawl. Without `written`, the state's documents count
+    as written."""
+
+    def __init__(self, state, town, lastname, refresh, written=None):
+        self.state = state
+        self.town = town
+        self.lastname = lastname
+        self.refresh = refresh
+        entry = state.get(town, lastname) or {}
+        self.known = set(entry.get('docs', []))
+        # only a query whose own last crawl walked every page may stop at known documents
+        self.can_stop = entry.get('pages') is not None and not entry.get('incomplete')
+        self.check_written = written is not None
+        self.newest = parse_doc_date(entry.get('newest') or '')
+        self.written = written if written is not None else set()
+        self.seen = set()
+        self.pages = 0
+        self.complete = True  # walked every page of the query
+        self.header = None
+
+    def page(self, rows):
+        self.pages += 1
+        data = []
+        for row in rows:
+            if is_header(row):
+                if self.header is None:
+                    self.header = row
+                continue
+            if len(row) > DOC_RECORDED_COL:
+                data.append(row)
+        # with the output file's Doc Numbers at hand, they alone decide what is already written
+        done = self.written if self.check_written else self.known
+        new = [row for row in data if row[DOC_NUMBER_COL] not in done and row[DOC_NUMBER_COL] not in self.seen]
+        for row in data:
+            self.seen.add(row[DOC_NUMBER_COL])
+            recorded = parse_doc_date(row[DOC_RECORDED_COL])
+            if recorded and (self.newest is None or recorded > self.newest):
+                self.newest = recorded
+        if not self.refresh:
+            return rows, True
+        if not self.can_stop:
+            return new, True
+        unknown = [row for row in data if row[DOC_NUMBER_COL] not in self.known
+                   or (self.check_written and row[DOC_NUMBER_COL] not in self.written)]
+        keep_paging = bool(unknown) or not data or not self._newest_first(data)
+        if not keep_paging:
+            self.complete = False
+        return new, keep_paging
+
+    @staticmethod
+    def _newest_first(data):
+        dates = [parse_doc_date(row[DOC_RECORDED_COL]) for row in data]
+        dates = [d for d in dates if d]
+        return all(a >= b for a, b in zip(dates, dates[1:]))
+
+    def _merge(self):
+        key = self.state.key(self.town, self.lastname)
+        entry = self.state.queries.get(key, {})
+        docs = self.known | self.seen
+        entry.update({
+            'docs': sorted(docs),
+            'newest': self.newest.isoformat() if self.newest else None,
+            'updated': time.time(),
+        })
+        self.state.queries[key] = entry
+        return entry
+
+    def finish(self):
+        entry = self._merge()
+        entry['rows'] = len(entry['docs'])
+        if self.complete:
+            entry['pages'] = self.pages
+        entry.pop('incomplete', None)
+        return len(self.seen - self.known)
+
+    def fail(self):
+        """Keep what was seen (those rows may already be written) without
+        touching the row and page counts of the last completed crawl, and mark
+        the query incomplete so the next refresh does not stop early."""
+        if not self.seen:
+            return 0
+        entry = self._merge()
+        entry['incomplete'] = True
+        return len(self.seen - self.known)
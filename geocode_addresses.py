@@ -1,6 +1,7 @@
-import pandas as pd
+import sys
 import time
-import requests
+
+import instrumentation
 
 def geocode_address(address, api_key=None):
     # Use Nominatim (OpenStreetMap) for free geocoding
@@ -13,7 +14,7 @@ def geocode_address(address, api_key=None):
     }
     headers = {"User-Agent": "GeoCoderScript/1.0"}
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response = instrumentation.get(url, params=params, headers=headers, timeout=10)
         response.raise_for_status()
         data = response.json()
         if data:
@@ -24,24 +25,44 @@ def geocode_address(address, api_key=None):
         print(f"Error geocoding '{address}': {e}")
     return None, None
 
-# Load combined CSV
-input_file = "all_towns_combined.csv"
-df = pd.read_csv(input_file)
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Geocode the Address column of all_towns_combined.csv')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure_from_args('geocode_addresses', args)
+
+    import pandas as pd
+
+    # Load combined CSV
+    input_file = "all_towns_combined.csv"
+    with instrumentation.stage("read_csv"):
+        df = pd.read_csv(input_file)
+
+    # Assume address column is named 'Property address' (update if needed)
+    if 'Address' not in df.columns:
+        raise Exception("Column 'Property address' not found in CSV.")
+
+    lats = []
+    lons = []
+    for address in df['Address']:
+        with instrumentation.stage("geocode"):
+            lat, lon = geocode_address(address)
+        lats.append(lat)
+        lons.append(lon)
+        with instrumentation.stage("sleep"):
+            time.sleep(1)  # Be polite to the API
+    instrumentation.count_rows("geocode", rows_in=len(df), rows_out=sum(1 for lat in lats if lat is not None))
 
-# Assume address column is named 'Property address' (update if needed)
-if 'Address' not in df.columns:
-    raise Exception("Column 'Property address' not found in CSV.")
+    df['Latitude'] = lats
+    df['Longitude'] = lons
 
-lats = []
-lons = []
-for address in df['Address']:
-    lat, lon = geocode_address(address)
-    lats.append(lat)
-    lons.append(lon)
-    time.sleep(1)  # Be polite to the API
+    with instrumentation.stage("write_csv"):
+        df.to_csv("all_towns_combined_geocoded.csv", index=False)
+    print("Geocoded file saved as all_towns_combined_geocoded.csv")
 
-df['Latitude'] = lats
-df['Longitude'] = lons
+    instrumentation.finish()
+    return 0
 
-df.to_csv("all_towns_combined_geocoded.csv", index=False)
-print("Geocoded file saved as all_towns_combined_geocoded.csv")
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,20 +1,23 @@
 # You may need to install BeautifulSoup: pip install beautifulsoup4 requests
 # website used for this https://crs.cookcountyclerkil.gov/Search
-import requests
-from bs4 import BeautifulSoup
 import csv
+import sys
+
+import instrumentation
+from crawl_state import DEFAULT_STATE, CrawlState, known_docs_in_csv, needs_header
 
 def read_csv_list(filename):
     with open(filename, "r") as f:
         return [line.strip() for line in f if line.strip()]
 
-lastnames = read_csv_list("lastnames.csv")
-townnames = read_csv_list("townnames.csv")
-
 headers = {
     "User-Agent": "Mozilla/5.0"
 }
 
+REQUEST_TIMEOUT = 30  # seconds
+
+header_row = ["View Doc","Doc Number","Doc Recorded","Doc Executed","Doc Type","1st Grantor","1st Grantee","Assoc. Doc#","1st PIN"]
+
 def get_table_data(soup):
     table = soup.find("table", {"id": "tblData"})
     if table:
@@ -29,43 +32,143 @@ def get_next_page_url(soup):
         return "https://crs.cookcountyclerkil.gov" + next_link["href"]
     return None
 
-for townname in townnames:
-    print(f"Processing town: {townname}")
-    with open(f"{townname}.csv", "w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        for lastname in lastnames:
-            url = f"https://crs.cookcountyclerkil.gov/Search/Result?id1={lastname}%20in%20{townname}"
-            page_url = url
-            first_page = True
-            # with open(f"{townname}_{lastname}.csv", "w", newline="") as csvfile:
-            # with open(f"{townname}.csv", "w", newline="") as csvfile:
-            #     writer = csv.writer(csvfile)
-            while page_url:
-                response = requests.get(page_url, headers=headers)
-                soup = BeautifulSoup(response.text, "html.parser")
-                table_data = get_table_data(soup)
-                if table_data:
-                    header_row = ["View Doc","Doc Number","Doc Recorded","Doc Executed","Doc Type","1st Grantor","1st Grantee","Assoc. Doc#","1st PIN"]
-                    for row in table_data:
-                        # Skip header rows
-                        if row == header_row:
-                            continue
-                        # Split '1st PIN' field if present
-                        if len(row) == 10:
-                            pin = row[9][:18]
-                            address = row[9][18:]
-                            new_row = row[:9] + [pin, address]
-                            writer.writerow(new_row)
-                        else:
-                            writer.writerow(row)
-                    print(f"Table data written from {page_url}")
-                else:
-                    print(f"Document table not found on {page_url}")
-                    break
-                next_page_url = get_next_page_url(soup)
-                print(f"Next page URL: {next_page_url}")
-                if next_page_url and next_page_url != page_url:
-                    page_url = next_page_url
-                    first_page = False
-                else:
-                    break
\ No newline at end of file
+def query_url(townname, lastname):
+    return f"https://crs.cookcountyclerkil.gov/Search/Result?id1={lastname}%20in%20{townname}"
+
+def clean_rows(table_data):
+    """Drop header rows and split the '1st PIN' cell into PIN and address."""
+    rows = []
+    for row in table_data:
+        # Skip header rows
+        if row == header_row:
+            continue
+        # Split '1st PIN' field if present
+        if len(row) == 10:
+            pin = row[9][:18]
+            address = row[9][18:]
+            rows.append(row[:9] + [pin, address])
+        else:
+            rows.append(row)
+    return rows
+
+def parse_page(html):
+    """Parse one result page into (cleaned rows or None, next page URL, table rows read).
+    The table row count matches what crawl_query counts as the parse stage's rows_in.
+    Module level so a process pool can run it."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    table_data = get_table_data(soup)
+    if not table_data:
+        return None, None, 0
+    return clean_rows(table_data), get_next_page_url(soup), len(table_data)
+
+def crawl_query(townname, lastname):
+    """Yield the cleaned rows of each result page, in page order, for one
+    (town, lastname) search. Raises on HTTP errors, timeouts and result pages
+    after the first that have no table, so a partial crawl never looks complete;
+    a first page without a table means the search has no results."""
+    from bs4 import BeautifulSoup
+    first_url = page_url = query_url(townname, lastname)
+    while page_url:
+        with instrumentation.stage("fetch"):
+            response = instrumentation.get(page_url, headers=headers, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+        with instrumentation.stage("parse"):
+            soup = BeautifulSoup(response.text, "html.parser")
+            table_data = get_table_data(soup)
+        if not table_data:
+            if page_url != first_url:
+                raise RuntimeError(f"Document table not found on {page_url}")
+            print(f"Document table not found on {page_url}")
+            break
+        rows = clean_rows(table_data)
+        instrumentation.count_rows("parse", rows_in=len(table_data), rows_out=len(rows))
+        yield rows
+        print(f"Table data written from {page_url}")
+        next_page_url = get_next_page_url(soup)
+        print(f"Next page URL: {next_page_url}")
+        if next_page_url and next_page_url != page_url:
+            page_url = next_page_url
+        else:
+            break
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Scrape Cook County Clerk search results per town and lastname')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Fetch, parse and write concurrently (see crawl_pipeline.py); rows of different lastnames interleave')
+    parser.add_argument('--fetchers', type=int, default=4, help='Concurrent page downloads with --pipeline (default: 4)')
+    parser.add_argument('--parsers', type=int, help='Parser processes with --pipeline (default: CPU count)')
+    parser.add_argument('--queue-size', type=int, default=32, help='Pages buffered between stages with --pipeline (default: 32)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Rows per disk write with --pipeline (default: 500)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Append only documents not seen before and stop paging at known results (see crawl_state.py)')
+    parser.add_argument('--state', default=DEFAULT_STATE, help='Per-query crawl state file (default: %(default)s)')
+    parser.add_argument('--plan', action='store_true',
+                        help='Skip subsumed lastname searches and run high-yield ones first (see query_planner.py)')
+    parser.add_argument('--match', choices=('prefix', 'substring'), default='prefix',
+                        help='How the site search matches names, for --plan (default: %(default)s)')
+    parser.add_argument('--trust-containment', action='store_true',
+                        help='With --plan, skip contained names even without past results to verify them')
+    parser.add_argument('--skip-zero', action='store_true',
+                        help='With --plan, skip names whose completed crawls returned nothing in every town')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure_from_args('getContactDetails', args)
+
+    lastnames = read_csv_list("lastnames.csv")
+    townnames = read_csv_list("townnames.csv")
+
+    state = CrawlState(args.state)
+
+    town_lastnames = {townname: lastnames for townname in townnames}
+    if args.plan:
+        from query_planner import plan_queries, print_plan
+        plan = plan_queries(townnames, lastnames, state, args.match, args.trust_containment, args.skip_zero)
+        print_plan(plan)
+        town_lastnames = plan['queries']
+
+    if args.pipeline:
+        from crawl_pipeline import run_pipeline
+        queries = [(townname, lastname) for townname in townnames for lastname in town_lastnames[townname]]
+        run_pipeline(townnames, lastnames, args.fetchers, args.parsers, args.queue_size, args.batch_size,
+                     state=state, refresh=args.refresh, queries=queries)
+        state.save()
+        instrumentation.finish()
+        return 0
+
+    for townname in townnames:
+        print(f"Processing town: {townname}")
+        # a refresh appends to the town file; it only needs a header row if the file is new
+        write_header = args.refresh and needs_header(f"{townname}.csv")
+        written = known_docs_in_csv(f"{townname}.csv") if args.refresh else None
+        with open(f"{townname}.csv", "a" if args.refresh else "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            for lastname in town_lastnames[townname]:
+                tracker = state.track(townname, lastname, refresh=args.refresh, written=written)
+                try:
+                    for rows in crawl_query(townname, lastname):
+                        rows, keep_paging = tracker.page(rows)
+                        if write_header and tracker.header and rows:
+                            rows = [tracker.header] + rows
+                            write_header = False
+                        with instrumentation.stage("write"):
+                            writer.writerows(rows)
+                        instrumentation.count_rows("write", rows_in=len(rows), rows_out=len(rows))
+                        if not keep_paging:
+                            print(f"Reached known documents for {lastname} in {townname}; stopping")
+                            break
+                except Exception as e:
+                    print(f"Query failed for {lastname} in {townname}: {e}")
+                    tracker.fail()
+                    continue
+                new_docs = tracker.finish()
+                if args.refresh:
+                    instrumentation.count_rows("refresh", rows_in=len(tracker.seen), rows_out=new_docs)
+        state.save()
+
+    instrumentation.finish()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,348 @@
+"""
+Run instrumentation shared by the scripts.
+
+Collects, for one script run:
+- per-stage wall and CPU time and call counts (`with stage('parse'): ...`); `stage()`
+  is meant for the main thread, worker threads report with `record_stage()`
+- tracemalloc peak memory per stage and for the whole run
+- per-host HTTP request counts, status codes and latency histograms (`get(url, ...)`)
+- cache hit/miss counters (`cache_hit('geocode')`, `cache_miss('geocode')`)
+- rows in/out per stage (`count_rows('filter', rows_in=..., rows_out=...)`)
+
+and writes them on `finish()` as a JSON run report and/or a Prometheus textfile
+(for node_exporter's textfile collector). With a profile directory set, each stage
+is run under its own cProfile profiler and dumped as `<stage>.prof` plus a
+`<stage>.txt` summary.
+
+Nothing is recorded to disk unless `configure()` was given a destination, so
+scripts can call the helpers unconditionally.
+
+Scripts wire it up with:
+
+    parser = argparse.ArgumentParser(...)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.configure_from_args('CleanupData', args)
+    ...
+    instrumentation.finish()
+"""
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+# Upper bounds (seconds) of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = 'webscraping'
+
+
+class Run:
+    def __init__(self, script='script', report_path=None, prometheus_path=None, profile_dir=None,
+                 trace_memory=False):
+        self.script = script
+        self.report_path = report_path
+        self.prometheus_path = prometheus_path
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.started = time.time()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.stages = {}
+        self.requests = {}
+        self.caches = {}
+        self.rows = {}
+        self.peak_memory = 0
+        self._stack = []  # [stage name, child peak] for the stages currently entered
+        self._profiles = {}
+        self._lock = threading.Lock()  # counters may be updated from worker threads
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # -- stages -------------------------------------------------------------
+
+    @contextmanager
+    def stage(self, name):
+        entry = self.stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                              'peak_memory_bytes': 0})
+        parent = self._stack[-1] if self._stack else None
+        if self.trace_memory:
+            # remember the peak reached so far by the parent before reset_peak() clears it
+            if parent is not None:
+                parent[1] = max(parent[1], tracemalloc.get_traced_memory()[1])
+            else:
+                self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        frame = [name, 0]
+        self._stack.append(frame)
+        profiler = self._enter_profile(name, parent)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            entry['calls'] += 1
+            entry['wall_seconds'] += time.perf_counter() - wall
+            entry['cpu_seconds'] += time.process_time() - cpu
+            self._exit_profile(profiler, parent)
+            self._stack.pop()
+            if self.trace_memory:
+                peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+                entry['peak_memory_bytes'] = max(entry['peak_memory_bytes'], peak)
+                if parent is not None:
+                    parent[1] = max(parent[1], peak)
+                else:
+                    self.peak_memory = max(self.peak_memory, peak)
+
+    def _enter_profile(self, name, parent):
+        if not self.profile_dir:
+            return None
+        profiler = self._profiles.setdefault(name, cProfile.Profile())
+        outer = self._profiles.get(parent[0]) if parent else None
+        if outer is profiler:
+            return None  # re-entering the same stage; its profiler is already running
+        if outer is not None:
+            outer.disable()
+        profiler.enable()
+        return profiler
+
+    def _exit_profile(self, profiler, parent):
+        if profiler is None:
+            return
+        profiler.disable()
+        outer = self._profiles.get(parent[0]) if parent else None
+        if outer is not None:
+            outer.enable()
+
+    # -- counters -----------------------------------------------------------
+
+    def record_request(self, url, seconds, status=None):
+        host = urlsplit(url).hostname or 'unknown'
+        with self._lock:
+            entry = self.requests.setdefault(host, {'count': 0, 'errors': 0, 'status': {}, 'latency_sum': 0.0,
+                                                    'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1)})
+            entry['count'] += 1
+            key = str(status) if status is not None else 'error'
+            entry['status'][key] = entry['status'].get(key, 0) + 1
+            if status is None or status >= 400:
+                entry['errors'] += 1
+            entry['latency_sum'] += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    entry['latency_buckets'][i] += 1
+                    break
+            else:
+                entry['latency_buckets'][-1] += 1
+
+    def record_stage(self, name, wall_seconds, cpu_seconds=0.0, calls=1):
+        """Add time measured outside stage(), e.g. summed over worker threads."""
+        with self._lock:
+            entry = self.stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                  'peak_memory_bytes': 0})
+            entry['calls'] += calls
+            entry['wall_seconds'] += wall_seconds
+            entry['cpu_seconds'] += cpu_seconds
+
+    def cache_hit(self, cache, n=1):
+        with self._lock:
+            self.caches.setdefault(cache, {'hits': 0, 'misses': 0})['hits'] += n
+
+    def cache_miss(self, cache, n=1):
+        with self._lock:
+            self.caches.setdefault(cache, {'hits': 0, 'misses': 0})['misses'] += n
+
+    def count_rows(self, stage_name, rows_in=0, rows_out=0):
+        with self._lock:
+            entry = self.rows.setdefault(stage_name, {'rows_in': 0, 'rows_out': 0})
+            entry['rows_in'] += rows_in
+            entry['rows_out'] += rows_out
+
+    # -- output -------------------------------------------------------------
+
+    def report(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+        return {
+            'script': self.script,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'wall_seconds': time.perf_counter() - self.wall_start,
+            'cpu_seconds': time.process_time() - self.cpu_start,
+            'peak_memory_bytes': self.peak_memory if self.trace_memory else None,
+            'stages': self.stages,
+            'requests': {host: dict(entry, latency_bucket_bounds=list(LATENCY_BUCKETS) + ['+Inf'])
+                         for host, entry in self.requests.items()},
+            'caches': self.caches,
+            'rows': self.rows,
+        }
+
+    def prometheus_text(self):
+        rep = self.report()
+        p = METRIC_PREFIX
+        script = _label(rep['script'])
+        lines = []
+
+        def metric(name, mtype, helptext, samples):
+            lines.append(f'# HELP {p}_{name} {helptext}')
+            lines.append(f'# TYPE {p}_{name} {mtype}')
+            for labels, value in samples:
+                label_text = ','.join([f'script="{script}"'] + [f'{k}="{_label(v)}"' for k, v in labels])
+                lines.append(f'{p}_{name}{{{label_text}}} {value}')
+
+        metric('run_wall_seconds', 'gauge', 'Wall time of the whole run.', [((), rep['wall_seconds'])])
+        metric('run_cpu_seconds', 'gauge', 'CPU time of the whole run.', [((), rep['cpu_seconds'])])
+        if rep['peak_memory_bytes'] is not None:
+            metric('run_peak_memory_bytes', 'gauge', 'tracemalloc peak of the whole run.',
+                   [((), rep['peak_memory_bytes'])])
+        stages = rep['stages'].items()
+        metric('stage_wall_seconds', 'gauge', 'Wall time spent per stage.',
+               [((('stage', s),), e['wall_seconds']) for s, e in stages])
+        metric('stage_cpu_seconds', 'gauge', 'CPU time spent per stage.',
+               [((('stage', s),), e['cpu_seconds']) for s, e in stages])
+        metric('stage_calls_total', 'counter', 'Times each stage was entered.',
+               [((('stage', s),), e['calls']) for s, e in stages])
+        if rep['peak_memory_bytes'] is not None:
+            metric('stage_peak_memory_bytes', 'gauge', 'tracemalloc peak per stage.',
+                   [((('stage', s),), e['peak_memory_bytes']) for s, e in stages])
+        metric('requests_total', 'counter', 'HTTP requests per host and status.',
+               [((('host', h), ('status', st)), n) for h, e in rep['requests'].items() for st, n in e['status'].items()])
+        hist = []
+        for host, e in rep['requests'].items():
+            cumulative = 0
+            for bound, n in zip(list(LATENCY_BUCKETS) + ['+Inf'], e['latency_buckets']):
+                cumulative += n
+                hist.append(((('host', host), ('le', bound)), cumulative))
+        if hist:
+            lines.append(f'# HELP {p}_request_latency_seconds HTTP request latency per host.')
+            lines.append(f'# TYPE {p}_request_latency_seconds histogram')
+            for labels, value in hist:
+                lines.append(f'{p}_request_latency_seconds_bucket{{script="{script}",host="{_label(labels[0][1])}",'
+                             f'le="{labels[1][1]}"}} {value}')
+            for host, e in rep['requests'].items():
+                lines.append(f'{p}_request_latency_seconds_sum{{script="{script}",host="{_label(host)}"}} {e["latency_sum"]}')
+                lines.append(f'{p}_request_latency_seconds_count{{script="{script}",host="{_label(host)}"}} {e["count"]}')
+        caches = rep['caches'].items()
+        metric('cache_hits_total', 'counter', 'Cache hits per cache.', [((('cache', c),), e['hits']) for c, e in caches])
+        metric('cache_misses_total', 'counter', 'Cache misses per cache.',
+               [((('cache', c),), e['misses']) for c, e in caches])
+        rows = rep['rows'].items()
+        metric('rows_in_total', 'counter', 'Rows read per stage.', [((('stage', s),), e['rows_in']) for s, e in rows])
+        metric('rows_out_total', 'counter', 'Rows written per stage.', [((('stage', s),), e['rows_out']) for s, e in rows])
+        return '\n'.join(lines) + '\n'
+
+    def dump_profiles(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        for name, profiler in self._profiles.items():
+            base = os.path.join(self.profile_dir, _filename(name))
+            profiler.dump_stats(base + '.prof')
+            with open(base + '.txt', 'wt', encoding='utf-8') as f:
+                stats = pstats.Stats(profiler, stream=f)
+                stats.sort_stats('cumulative').print_stats(40)
+
+    def finish(self):
+        if self.report_path:
+            _write_atomic(self.report_path, json.dumps(self.report(), indent=2))
+            print(f'Wrote run report: {self.report_path}')
+        if self.prometheus_path:
+            _write_atomic(self.prometheus_path, self.prometheus_text())
+            print(f'Wrote Prometheus textfile: {self.prometheus_path}')
+        if self.profile_dir and self._profiles:
+            self.dump_profiles()
+            print(f'Wrote stage profiles to {self.profile_dir}')
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _filename(name):
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+
+
+def _write_atomic(path, text):
+    # textfile collectors may read at any moment; never expose a half written file
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wt', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+_run = Run()
+
+
+def configure(script, report_path=None, prometheus_path=None, profile_dir=None, trace_memory=None):
+    """Start a new run. Memory is traced by default whenever a report is requested."""
+    global _run
+    if trace_memory is None:
+        trace_memory = bool(report_path or prometheus_path)
+    _run = Run(script, report_path, prometheus_path, profile_dir, trace_memory)
+    return _run
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--report', metavar='PATH', help='Write a JSON run report (stage timings, memory, requests, caches, rows)')
+    group.add_argument('--prometheus', metavar='PATH', help='Write metrics as a Prometheus textfile')
+    group.add_argument('--profile', metavar='DIR', help='Profile each stage with cProfile and dump the results into DIR')
+    group.add_argument('--no-trace-memory', action='store_true', help='Skip tracemalloc (it slows allocation-heavy stages)')
+    return parser
+
+
+def configure_from_args(script, args):
+    trace_memory = False if args.no_trace_memory else None
+    return configure(script, args.report, args.prometheus, args.profile, trace_memory)
+
+
+def current():
+    return _run
+
+
+def stage(name):
+    return _run.stage(name)
+
+
+def record_request(url, seconds, status=None):
+    _run.record_request(url, seconds, status)
+
+
+def cache_hit(cache, n=1):
+    _run.cache_hit(cache, n)
+
+
+def cache_miss(cache, n=1):
+    _run.cache_miss(cache, n)
+
+
+def count_rows(stage_name, rows_in=0, rows_out=0):
+    _run.count_rows(stage_name, rows_in, rows_out)
+
+
+def record_stage(name, wall_seconds, cpu_seconds=0.0, calls=1):
+    _run.record_stage(name, wall_seconds, cpu_seconds, calls)
+
+
+def get(url, **kwargs):
+    """requests.get() that records per-host count, status and latency."""
+    import requests
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, **kwargs)
+    except Exception:
+        record_request(url, time.perf_counter() - start)
+        raise
+    record_request(url, time.perf_counter() - start, response.status_code)
+    return response
+
+
+def report():
+    return _run.report()
+
+
+def finish():
+    _run.finish()
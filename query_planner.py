@@ -0,0 +1,180 @@
+"""
+Query planner for getContactDetails.py: skip redundant lastname searches and run
+high-yield ones first.
+
+CleanupData.py keeps a row when a lastname appears anywhere in 1st Grantor or
+1st Grantee. So a search for a longer name ("Kumaran") whose results are all
+returned by a shorter name it contains ("Kumar") adds no rows. For each town, a
+query is:
+
+- skipped when a shorter name it contains is also being queried, and crawl_state.json
+  shows that, in this town, the longer query returned at least one document and every
+  document it returned was also returned by the shorter one (the subsumption is verified);
+  a longer query that returned nothing proves nothing and is at most deferred;
+- deferred to the end when a shorter contained name exists but there are no stats to
+  verify it. `trust_containment=True` skips these too. That is only safe if the site
+  search matches names by `match` (prefix by default);
+- deferred when past crawls returned nothing for the name in every town crawled so far;
+  `skip_zero=True` skips it only once a completed crawl of every planned town returned
+  nothing (e.g. for nightly refreshes).
+
+Only completed crawls count as stats. Entries left by failed queries have no page count
+and are ignored.
+
+Remaining queries run in descending order of expected rows: this town's past count, or
+the name's average over other towns. Skipped requests are estimated from each query's
+recorded page count, or the average pages per query when it has none.
+
+Usage:
+  python query_planner.py [--lastnames lastnames.csv] [--towns townnames.csv] [--state crawl_state.json]
+                          [--match prefix|substring] [--trust-containment] [--skip-zero] [--show-skipped]
+"""
+import sys
+
+from crawl_state import DEFAULT_STATE, CrawlState
+
+
+def _contains(longer, shorter, match):
+    if match == 'prefix':
+        return longer.startswith(shorter)
+    return shorter in longer
+
+
+def plan_queries(townnames, lastnames, state=None, match='prefix', trust_containment=False, skip_zero=False):
+    """Return {'queries': {town: [lastname, ...]}, 'skipped': [...], 'deferred': [...], 'estimate': {...}}.
+    skipped/deferred entries are (town, lastname, reason)."""
+    queries = state.queries if state is not None else {}
+    stats = {}  # lastname -> {town: entry}, completed crawls only
+    for key, entry in queries.items():
+        if entry.get('pages') is None:
+            continue  # only failed attempts so far; nothing is known about this query
+        town, _, lastname = key.partition('|')
+        stats.setdefault(lastname, {})[town] = entry
+
+    crawled = [e for by_town in stats.values() for e in by_town.values() if e['pages']]
+    avg_pages = sum(e['pages'] for e in crawled) / len(crawled) if crawled else 1.0
+
+    def pages(town, lastname):
+        entry = stats.get(lastname, {}).get(town)
+        if entry and entry.get('pages') is not None:
+            return max(entry['pages'], 1)
+        return avg_pages
+
+    def expected_rows(town, lastname):
+        by_town = stats.get(lastname, {})
+        if town in by_town:
+            return by_town[town].get('rows', 0)
+        if by_town:
+            return sum(e.get('rows', 0) for e in by_town.values()) / len(by_town)
+        return None
+
+    # shorter names first so that a covering name is decided before the names it covers
+    unique = list(dict.fromkeys(lastnames))
+    by_length = sorted(unique, key=lambda n: (len(n), n.lower()))
+
+    plan = {}
+    skipped = []
+    deferred = []
+    for town in townnames:
+        kept = []  # lastnames that will be queried in this town, lower-cased
+        kept_names = {}
+        run_first = []
+        run_last = []
+        for name in by_length:
+            lname = name.lower()
+            if lname in kept_names:
+                skipped.append((town, name, f'same query as {kept_names[lname]}'))
+                continue
+            coverers = [kept_names[k] for k in kept if _contains(lname, k, match)]
+            verdict = None
+            for cover in coverers:
+                mine = stats.get(name, {}).get(town)
+                theirs = stats.get(cover, {}).get(town)
+                if mine is not None and theirs is not None:
+                    docs = set(mine.get('docs', []))
+                    if mine['pages'] >= 1 and docs and docs <= set(theirs.get('docs', [])):
+                        verdict = ('skip', f'results subsumed by {cover} (verified)')
+                        break
+                    if not docs and verdict is None:
+                        verdict = ('defer', f'contains {cover}; returned nothing last time')
+                elif verdict is None:
+                    verdict = ('skip' if trust_containment else 'defer', f'contains {cover}')
+            if verdict and verdict[0] == 'skip':
+                skipped.append((town, name, verdict[1]))
+                continue
+            name_stats = stats.get(name, {})
+            zero = bool(name_stats) and all(e.get('rows', 0) == 0 for e in name_stats.values())
+            if verdict is None and zero:
+                if skip_zero and all(t in name_stats for t in townnames):
+                    skipped.append((town, name, f'no results in {len(name_stats)} towns'))
+                    continue
+                verdict = ('defer', f'no results in {len(name_stats)} towns')
+            kept.append(lname)
+            kept_names[lname] = name
+            if verdict:
+                deferred.append((town, name, verdict[1]))
+                run_last.append(name)
+            else:
+                run_first.append(name)
+
+        # unknown yield sorts between known producers and known zeros
+        def order(n):
+            rows = expected_rows(town, n)
+            return -(rows if rows is not None else 0.5)
+        run_first.sort(key=order)
+        run_last.sort(key=order)
+        plan[town] = run_first + run_last
+
+    full = sum(pages(town, name) for town in townnames for name in unique)
+    saved = sum(pages(town, name) for town, name, _ in skipped)
+    return {
+        'queries': plan,
+        'skipped': skipped,
+        'deferred': deferred,
+        'estimate': {
+            'queries_total': len(townnames) * len(unique),
+            'queries_planned': sum(len(v) for v in plan.values()),
+            'requests_full': round(full),
+            'requests_saved': round(saved),
+            'avg_pages_per_query': round(avg_pages, 2),
+        },
+    }
+
+
+def print_plan(plan, show_skipped=False):
+    est = plan['estimate']
+    print(f"Planned {est['queries_planned']} of {est['queries_total']} queries; "
+          f"{len(plan['skipped'])} skipped, {len(plan['deferred'])} deferred to the end")
+    print(f"Estimated requests: {est['requests_full'] - est['requests_saved']} instead of {est['requests_full']} "
+          f"(~{est['requests_saved']} saved, {est['avg_pages_per_query']} pages per query on average)")
+    if show_skipped:
+        for town, name, reason in plan['skipped']:
+            print(f'  skip  {name} in {town}: {reason}')
+        for town, name, reason in plan['deferred']:
+            print(f'  defer {name} in {town}: {reason}')
+
+
+def main(argv=None):
+    import argparse
+    from getContactDetails import read_csv_list
+    parser = argparse.ArgumentParser(description='Show which lastname searches the planner would skip or defer')
+    parser.add_argument('--lastnames', default='lastnames.csv')
+    parser.add_argument('--towns', default='townnames.csv')
+    parser.add_argument('--state', default=DEFAULT_STATE, help='Crawl state with past results (default: %(default)s)')
+    parser.add_argument('--match', choices=('prefix', 'substring'), default='prefix',
+                        help='How the site search matches names (default: %(default)s)')
+    parser.add_argument('--trust-containment', action='store_true',
+                        help='Skip contained names even without past results to verify them')
+    parser.add_argument('--skip-zero', action='store_true',
+                        help='Skip names whose completed crawls returned nothing in every town')
+    parser.add_argument('--show-skipped', action='store_true', help='List every skipped and deferred query')
+    args = parser.parse_args(argv)
+
+    plan = plan_queries(read_csv_list(args.towns), read_csv_list(args.lastnames), CrawlState(args.state),
+                        args.match, args.trust_containment, args.skip_zero)
+    print_plan(plan, args.show_skipped)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
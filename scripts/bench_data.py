@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generators for the benchmark suite.
+
+Every generator is deterministic for a given `seed` so two benchmark runs
+measure exactly the same input. Nothing here touches the network or `Data/`.
+
+Generators:
+- clerk_result_page(n_rows)      HTML page with a `tblData` table like the clerk search results
+- raw_town_csv(path, n_rows)     town CSV as written by getContactDetails.py, with repeated header rows
+- lastname_list(n)               list of lastnames (optionally written one per line)
+- kml_document(n_placemarks)     KML string with Placemarks carrying ExtendedData
+- boundary_polygon_coords(n)     closed ring of (lon, lat) tuples around a centre point
+- pocket_workbook(path, n_rows)  pocket .xlsx with `Folder Name`, address parts and date columns
+
+Usage: python3 scripts/bench_data.py --out bench_data   (writes one sample of each)
+"""
+from pathlib import Path
+import csv
+import math
+import random
+import string
+import sys
+from xml.sax.saxutils import escape
+
+# Roughly the middle of Des Plaines; points are scattered around it.
+CENTER_LON = -87.8834
+CENTER_LAT = 42.0334
+
+RAW_HEADER = ["Blank", "View Doc", "Doc Number", "Doc Recorded", "Doc Executed", "Doc Type",
+              "1st Grantor", "1st Grantee", "Assoc. Doc#", "1st PIN", "Address"]
+DOC_TYPES = ["WARRANTY DEED", "MORTGAGE", "RELEASE", "TRUSTEES DEED", "QUIT CLAIM DEED", "MECHANICS LIEN"]
+STREETS = ["SHETLAND RD", "BOLAND DR", "OAKTON ST", "RAND RD", "LEE ST", "GOLF RD", "ALGONQUIN RD"]
+CITIES = ["PALATINE", "DES PLAINES", "WHEELING", "INVERNESS", "BARRINGTON", "MOUNT PROSPECT"]
+
+
+def _word(rng, lo=4, hi=9):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(lo, hi))).capitalize()
+
+
+def lastname_list(n, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        names.add(_word(rng))
+    return sorted(names)
+
+
+def write_lastname_list(path, n, seed=0):
+    names = lastname_list(n, seed)
+    with open(path, 'wt', encoding='utf-8') as f:
+        for name in names:
+            f.write(name + '\n')
+    return names
+
+
+def _party(rng, lastnames, hit_rate):
+    if lastnames and rng.random() < hit_rate:
+        return f"{rng.choice(lastnames).upper()} {_word(rng).upper()}"
+    return f"{_word(rng).upper()} {_word(rng).upper()}"
+
+
+def _pin(rng):
+    return f"{rng.randint(1, 99):02d}-{rng.randint(1, 99):02d}-{rng.randint(100, 999)}-{rng.randint(1, 99):03d}-0000"
+
+
+def _address(rng):
+    return f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+
+
+def _doc_row(rng, lastnames, hit_rate):
+    recorded = f"{rng.randint(1990, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    executed = f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(1990, 2025)}"
+    return ['', 'View', str(rng.randint(10 ** 7, 10 ** 10)), recorded, executed, rng.choice(DOC_TYPES),
+            _party(rng, lastnames, hit_rate), _party(rng, lastnames, hit_rate), '', _pin(rng), _address(rng)]
+
+
+def clerk_result_page(n_rows, seed=0, lastnames=None, next_href='/Search/Result?page=2'):
+    """Return HTML shaped like a clerk search result page with n_rows documents."""
+    rng = random.Random(seed)
+    lastnames = lastnames or lastname_list(50, seed)
+    head = ''.join(f'<th>{escape(h)}</th>' for h in [''] + RAW_HEADER[1:10])
+    body = []
+    for _ in range(n_rows):
+        row = _doc_row(rng, lastnames, 0.3)
+        cells = row[:9] + [row[9] + row[10]]  # the site renders PIN and address in one cell
+        body.append('<tr>' + ''.join(f'<td>{escape(c)}</td>' for c in cells) + '</tr>')
+    nxt = f'<a rel="next" href="{escape(next_href)}">Next</a>' if next_href else ''
+    return ('<html><head><title>Search Result</title></head><body>'
+            '<div class="nav"><a href="/">Home</a><a href="/Search">Search</a></div>'
+            f'<table id="tblData" class="table"><thead><tr>{head}</tr></thead>'
+            f'<tbody>{"".join(body)}</tbody></table>'
+            f'<div class="pager">{nxt}</div></body></html>')
+
+
+def raw_town_csv(path, n_rows, seed=0, lastnames=None, rows_per_query=25, hit_rate=0.2):
+    """Write a raw town CSV; a header row is repeated every rows_per_query rows
+    the way getContactDetails.py appends one result table per lastname."""
+    rng = random.Random(seed)
+    lastnames = lastnames or lastname_list(200, seed)
+    with open(path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(RAW_HEADER)
+        for i in range(n_rows):
+            if i and i % rows_per_query == 0:
+                writer.writerow(RAW_HEADER)
+            writer.writerow(_doc_row(rng, lastnames, hit_rate))
+    return path
+
+
+def _scatter(rng, spread):
+    return CENTER_LON + rng.uniform(-spread, spread), CENTER_LAT + rng.uniform(-spread, spread)
+
+
+def boundary_polygon_coords(n_vertices, radius=0.02, seed=0):
+    """Closed ring of (lon, lat) tuples: a jittered circle around the centre."""
+    rng = random.Random(seed)
+    coords = []
+    for i in range(n_vertices):
+        angle = 2 * math.pi * i / n_vertices
+        r = radius * rng.uniform(0.8, 1.0)
+        coords.append((CENTER_LON + r * math.cos(angle), CENTER_LAT + r * math.sin(angle)))
+    coords.append(coords[0])
+    return coords
+
+
+def boundary_kml(n_vertices, radius=0.02, seed=0):
+    """Boundary KML with a LineString, as read by FindPointsInArea.get_boundary_polygon."""
+    coords = ' '.join(f'{lon},{lat},0' for lon, lat in boundary_polygon_coords(n_vertices, radius, seed))
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<kml xmlns="http://www.opengis.net/kml/2.2"><Document><Placemark><name>Area</name>'
+            f'<LineString><coordinates>{coords}</coordinates></LineString></Placemark></Document></kml>')
+
+
+def kml_document(n_placemarks, seed=0, spread=0.04, missing_rate=0.1):
+    """KML string with n_placemarks; missing_rate of them carry no Point."""
+    rng = random.Random(seed)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>']
+    for i in range(n_placemarks):
+        address = _address(rng)
+        street, city = address.split(', ')
+        parts.append(f'<Placemark><name>P{i:06d}</name>')
+        parts.append(f'<description>{escape(_word(rng))} {escape(_word(rng))}</description>')
+        parts.append(f'<address>{escape(address)}</address>')
+        parts.append('<ExtendedData>')
+        for key, val in (('Address Line 1', street), ('City', city), ('Town', city.title()), ('1st PIN', _pin(rng))):
+            parts.append(f'<Data name="{key}"><value>{escape(val)}</value></Data>')
+        parts.append('</ExtendedData>')
+        if rng.random() >= missing_rate:
+            lon, lat = _scatter(rng, spread)
+            parts.append(f'<Point><coordinates>{lon},{lat},0</coordinates></Point>')
+        parts.append('</Placemark>')
+    parts.append('</Document></kml>')
+    return ''.join(parts)
+
+
+def placemark_dicts(n, seed=0, spread=0.04):
+    """Placemarks in the dict shape returned by parse_placemarks_from_kml_string."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        lon, lat = _scatter(rng, spread)
+        out.append({
+            'name': f'P{i:06d}',
+            'description': _word(rng),
+            'address_tag': _address(rng),
+            'lon': lon,
+            'lat': lat,
+            'extended': {'Address Line 1': _address(rng).split(', ')[0], '1st PIN': _pin(rng)},
+        })
+    return out
+
+
+def pocket_workbook(path, n_rows, n_folders=8, seed=0, date_columns=('2025-10-11', '2025-10-18')):
+    """Write a pocket workbook like DesplainesPocket.xlsx. Requires pandas + openpyxl."""
+    import pandas as pd
+    rng = random.Random(seed)
+    folders = [f'MP-{i:02d}' for i in range(1, n_folders + 1)]
+    rows = []
+    for _ in range(n_rows):
+        street, city = _address(rng).split(', ')
+        row = {
+            'Folder Name': rng.choice(folders),
+            'Name': f'{_word(rng)} {_word(rng)}',
+            'Address Line 1': street,
+            'City': city,
+            'State': 'IL',
+            'Zip': str(rng.randint(60001, 60099)),
+        }
+        for d in date_columns:
+            row[d] = rng.choice(['', 'Knocked', 'Not home', 'Flyer'])
+        rows.append(row)
+    pd.DataFrame(rows).to_excel(path, index=False, engine='openpyxl')
+    return path
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Write one sample of each synthetic benchmark input')
+    parser.add_argument('--out', '-o', default='bench_data', help='Output directory (default: bench_data)')
+    parser.add_argument('--rows', '-n', type=int, default=1000, help='Rows/placemarks per sample (default: 1000)')
+    args = parser.parse_args(argv)
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    (out / 'result_page.html').write_text(clerk_result_page(args.rows), encoding='utf-8')
+    raw_town_csv(out / 'Town.csv', args.rows)
+    write_lastname_list(out / 'lastnames.csv', 200)
+    (out / 'points.kml').write_text(kml_document(args.rows), encoding='utf-8')
+    (out / 'area.kml').write_text(boundary_kml(200), encoding='utf-8')
+    try:
+        pocket_workbook(out / 'Pocket.xlsx', args.rows)
+    except ImportError as e:
+        print(f'Skipping Pocket.xlsx: {e}')
+    print(f'Wrote synthetic samples to {out}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
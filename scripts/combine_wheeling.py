@@ -9,7 +9,7 @@ Behavior:
 - Also adds `Source File` column with the original filename.
 - Concatenates all rows and writes `Data/WheelingMtProspect_combined.xlsx` with sheet name `combined`.
 
-Usage: python3 scripts/combine_wheeling.py
+Usage: python3 scripts/combine_wheeling.py [--report run.json] [--prometheus run.prom] [--profile profiles/]
 
 Requires: pandas, openpyxl
 """
@@ -23,6 +23,12 @@ except Exception:
     print("Missing dependency: pandas (and openpyxl). Install with: pip install pandas openpyxl")
     raise
 
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import instrumentation  # noqa: E402
+
 DATA_DIR = Path('Data')
 
 
@@ -76,7 +82,9 @@ def main(argv=None):
     parser = argparse.ArgumentParser(description='Combine split Excel files for a given base name')
     parser.add_argument('--base', '-b', default='WheelingMtProspect', help='Base name to match (default: WheelingMtProspect)')
     parser.add_argument('--out', '-o', help='Output file path (optional). If not set, uses Data/<base>_combined.xlsx')
+    instrumentation.add_arguments(parser)
     args = parser.parse_args(argv)
+    instrumentation.configure_from_args('combine_wheeling', args)
 
     base = args.base
     out_file = Path(args.out) if args.out else default_out_file(base)
@@ -84,13 +92,15 @@ def main(argv=None):
     files = find_files(base)
     if not files:
         print(f'No matching files found for base "{base}" in {DATA_DIR} or {DATA_DIR / base}')
+        instrumentation.finish()
         return 2
 
     frames = []
     summary = []
     for p in files:
         try:
-            df = read_sheet(p)
+            with instrumentation.stage('read_excel'):
+                df = read_sheet(p)
         except Exception as e:
             print(f'Failed to read {p}: {e}')
             continue
@@ -119,7 +129,8 @@ def main(argv=None):
                     parts.append(s)
                 return '; '.join(parts) if parts else ''
 
-            df['Activity'] = df.apply(consolidate_activity, axis=1)
+            with instrumentation.stage('consolidate_activity'):
+                df['Activity'] = df.apply(consolidate_activity, axis=1)
             # drop the original date columns
             df = df.drop(columns=date_cols, errors='ignore')
             print(f'  Consolidated date columns {date_cols} into Activity')
@@ -132,16 +143,21 @@ def main(argv=None):
 
     if not frames:
         print('No data frames read successfully.')
+        instrumentation.finish()
         return 1
 
-    combined = pd.concat(frames, ignore_index=True, sort=False)
+    with instrumentation.stage('concat'):
+        combined = pd.concat(frames, ignore_index=True, sort=False)
+    instrumentation.count_rows('concat', rows_in=sum(len(df) for df in frames), rows_out=len(combined))
 
     # write to excel
     try:
-        combined.to_excel(out_file, index=False, sheet_name='combined', engine='openpyxl')
+        with instrumentation.stage('write_excel'):
+            combined.to_excel(out_file, index=False, sheet_name='combined', engine='openpyxl')
         print(f'Wrote combined file: {out_file} ({len(combined)} rows)')
     except Exception as e:
         print('Failed to write combined file:', e)
+        instrumentation.finish()
         return 1
 
     # print preview
@@ -154,6 +170,7 @@ def main(argv=None):
     for name, token, rows in summary:
         print(f'  {name} -> {token} ({rows} rows)')
 
+    instrumentation.finish()
     return 0
 
 
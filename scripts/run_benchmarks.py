@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Benchmark the hot paths of the scraping / cleanup / KML scripts on synthetic data.
+
+Behavior:
+- Builds inputs with `scripts/bench_data.py` in a temporary directory (never touches `Data/`).
+- Times each benchmark `--repeat` times and reports the median wall time and throughput (items/s).
+- Runs each benchmark once more under tracemalloc to report peak Python memory.
+- `--save-baseline` writes the results as JSON; `--compare` checks a run against a saved baseline
+  and exits with status 1 if any benchmark is slower or uses more memory than `--tolerance` allows.
+- Benchmarks whose dependencies (bs4, pandas, shapely, openpyxl) are missing are reported as skipped.
+
+Usage:
+  python3 scripts/run_benchmarks.py
+  python3 scripts/run_benchmarks.py --only cleanup_mask,parse_placemarks --scale 2
+  python3 scripts/run_benchmarks.py --save-baseline bench_baseline.json
+  python3 scripts/run_benchmarks.py --compare bench_baseline.json --tolerance 0.25
+"""
+from pathlib import Path
+import contextlib
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import bench_data  # noqa: E402  (lives next to this script)
+
+
+# Each benchmark is (name, setup). setup(workdir, scale) returns (fn, items) where fn()
+# is the timed call and items is the number of rows/placemarks/files it processes.
+
+def setup_get_table_data(workdir, scale):
+    from bs4 import BeautifulSoup
+    from getContactDetails import get_table_data
+    n = 500 * scale
+    soup = BeautifulSoup(bench_data.clerk_result_page(n), 'html.parser')
+    return (lambda: get_table_data(soup)), n
+
+
+def setup_parse_result_page(workdir, scale):
+    from bs4 import BeautifulSoup
+    from getContactDetails import get_table_data, get_next_page_url
+    n = 500 * scale
+    html = bench_data.clerk_result_page(n)
+
+    def run():
+        soup = BeautifulSoup(html, 'html.parser')
+        get_table_data(soup)
+        get_next_page_url(soup)
+    return run, n
+
+
+def setup_cleanup_mask(workdir, scale):
+    import pandas as pd
+    from CleanupData import filter_by_lastname
+    n = 5000 * scale
+    names = bench_data.lastname_list(2000)
+    path = bench_data.raw_town_csv(workdir / 'Town.csv', n, lastnames=names[:200])
+    df = pd.read_csv(path)
+    lastname_filter = set(names)
+    return (lambda: filter_by_lastname(df.copy(), lastname_filter)), n
+
+
+def setup_parse_placemarks(workdir, scale):
+    from FindPointsInArea import parse_placemarks_from_kml_string
+    n = 5000 * scale
+    doc = bench_data.kml_document(n)
+    return (lambda: parse_placemarks_from_kml_string(doc)), n
+
+
+def setup_points_in_boundary(workdir, scale):
+    from shapely.geometry import Polygon
+    from FindPointsInArea import filter_points_in_boundary
+    n = 20000 * scale
+    placemarks = bench_data.placemark_dicts(n)
+    polygon = Polygon(bench_data.boundary_polygon_coords(400))
+    return (lambda: filter_points_in_boundary(placemarks, polygon)), n
+
+
+def setup_write_kml(workdir, scale):
+    from FindPointsInArea import write_kml_with_points
+    n = 5000 * scale
+    placemarks = bench_data.placemark_dicts(n)
+    out = workdir / 'out.kml'
+    return (lambda: write_kml_with_points(placemarks, out)), n
+
+
+def setup_split_file(workdir, scale):
+    import split_xlsx_by_folder
+    n = 2000 * scale
+    src = workdir / 'split'
+    src.mkdir(exist_ok=True)
+    path = bench_data.pocket_workbook(src / 'DesplainesPocket.xlsx', n)
+    return (lambda: split_xlsx_by_folder.split_file(path)), n
+
+
+def setup_combine_wheeling(workdir, scale):
+    import combine_wheeling
+    n_files = 8
+    rows = 250 * scale
+    data_dir = workdir / 'combine'
+    sub = data_dir / 'WheelingMtProspect'
+    sub.mkdir(parents=True, exist_ok=True)
+    for i in range(n_files):
+        bench_data.pocket_workbook(sub / f'WheelingMtProspectPocket__MP-{i + 1:02d}.xlsx', rows, n_folders=1, seed=i)
+    out = data_dir / 'combined.xlsx'
+
+    def run():
+        combine_wheeling.DATA_DIR = data_dir
+        combine_wheeling.main(['--base', 'WheelingMtProspect', '--out', str(out)])
+    return run, n_files * rows
+
+
+BENCHMARKS = [
+    ('get_table_data', setup_get_table_data),
+    ('parse_result_page', setup_parse_result_page),
+    ('cleanup_mask', setup_cleanup_mask),
+    ('parse_placemarks', setup_parse_placemarks),
+    ('points_in_boundary', setup_points_in_boundary),
+    ('write_kml', setup_write_kml),
+    ('split_file', setup_split_file),
+    ('combine_wheeling', setup_combine_wheeling),
+]
+
+
+def measure(fn, repeat):
+    # the scripts print progress lines; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()  # warm-up
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return times, peak
+
+
+def run_benchmarks(names, scale, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+        for name, setup in BENCHMARKS:
+            if names and name not in names:
+                continue
+            workdir = Path(tmp) / name
+            workdir.mkdir()
+            try:
+                fn, items = setup(workdir, scale)
+            except ImportError as e:
+                print(f'{name:<20} skipped (missing dependency: {e.name})')
+                results[name] = {'skipped': str(e)}
+                continue
+            times, peak = measure(fn, repeat)
+            median = statistics.median(times)
+            results[name] = {
+                'items': items,
+                'seconds': median,
+                'min_seconds': min(times),
+                'throughput': items / median if median else None,
+                'peak_bytes': peak,
+            }
+            print(f'{name:<20} {items:>8} items  {median * 1000:>10.2f} ms  '
+                  f'{results[name]["throughput"]:>12.0f} items/s  peak {peak / 1e6:>8.2f} MB')
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human readable regressions against baseline."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or 'skipped' in cur or 'skipped' in base:
+            continue
+        if base['items'] != cur['items']:
+            print(f'  {name}: baseline used {base["items"]} items, this run {cur["items"]}; not compared')
+            continue
+        ratio = cur['seconds'] / base['seconds'] if base['seconds'] else 1.0
+        mem_ratio = cur['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else 1.0
+        print(f'  {name:<20} time x{ratio:.2f}  memory x{mem_ratio:.2f}')
+        if ratio > 1 + tolerance:
+            regressions.append(f'{name}: {ratio:.2f}x slower than baseline')
+        if mem_ratio > 1 + tolerance:
+            regressions.append(f'{name}: {mem_ratio:.2f}x more peak memory than baseline')
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark hot paths on synthetic data')
+    parser.add_argument('--only', help='Comma separated benchmark names (default: all)')
+    parser.add_argument('--scale', type=int, default=1, help='Multiply input sizes by this factor (default: 1)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark (default: 5)')
+    parser.add_argument('--save-baseline', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Compare against a baseline JSON file written by --save-baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown/memory growth before a benchmark counts as regressed (default: 0.2)')
+    parser.add_argument('--list', action='store_true', help='List benchmark names and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, _ in BENCHMARKS:
+            print(name)
+        return 0
+
+    names = set(args.only.split(',')) if args.only else set()
+    unknown = names - {name for name, _ in BENCHMARKS}
+    if unknown:
+        print(f'Unknown benchmarks: {sorted(unknown)}')
+        return 2
+
+    results = run_benchmarks(names, args.scale, args.repeat)
+
+    if args.save_baseline:
+        payload = {'python': sys.version.split()[0], 'scale': args.scale, 'repeat': args.repeat,
+                   'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+        with open(args.save_baseline, 'wt', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f'Saved baseline: {args.save_baseline}')
+
+    if args.compare:
+        try:
+            with open(args.compare, 'rt', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'Failed to load baseline {args.compare}: {e}')
+            return 2
+        print(f'\nCompared with {args.compare}:')
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\nRegressions:')
+            for r in regressions:
+                print(f'  {r}')
+            return 1
+        print('No regressions.')
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
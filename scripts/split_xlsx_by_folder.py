@@ -3,7 +3,7 @@
 Split Excel files by the "Folder Name" column.
 
 Usage:
-  python scripts/split_xlsx_by_folder.py [files...]
+  python scripts/split_xlsx_by_folder.py [files...] [--report run.json] [--prometheus run.prom] [--profile profiles/]
 
 If no files are passed, the script will look for PalatinePocket.xlsx and WheelingMtProspectPocket.xlsx
 in the current directory and in the Data/ directory.
@@ -16,6 +16,12 @@ import sys
 from pathlib import Path
 import re
 
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import instrumentation  # noqa: E402
+
 DEFAULT_FILES = ['DesplainesPocket.xlsx']
 
 
@@ -58,7 +64,8 @@ def split_file(path: Path):
         return False
 
     try:
-        df = pd.read_excel(path, engine='openpyxl')
+        with instrumentation.stage('read_excel'):
+            df = pd.read_excel(path, engine='openpyxl')
     except Exception as e:
         print(f"Failed to read {path}: {e}")
         return False
@@ -131,13 +138,14 @@ def split_file(path: Path):
 
         # prepare output DataFrame with combined Address and without Folder Name
         out_df = group.copy()
-        try:
-            out_df['Address'] = out_df.apply(make_address, axis=1)
-        except Exception:
-            # fallback: create Address column from available columns without apply
-            out_df['Address'] = ''
-            for idx, row in out_df.iterrows():
-                out_df.at[idx, 'Address'] = make_address(row)
+        with instrumentation.stage('make_address'):
+            try:
+                out_df['Address'] = out_df.apply(make_address, axis=1)
+            except Exception:
+                # fallback: create Address column from available columns without apply
+                out_df['Address'] = ''
+                for idx, row in out_df.iterrows():
+                    out_df.at[idx, 'Address'] = make_address(row)
 
         # drop the now-unneeded address components and the folder column
         drop_cols = [c for c in (addr_col, city_col, state_col, zip_col) if c is not None]
@@ -153,7 +161,9 @@ def split_file(path: Path):
             final_cols = ['Address'] + final_cols
 
         try:
-            out_df.to_excel(out_path, index=False, columns=final_cols, engine='openpyxl')
+            with instrumentation.stage('write_excel'):
+                out_df.to_excel(out_path, index=False, columns=final_cols, engine='openpyxl')
+            instrumentation.count_rows('split', rows_in=len(group), rows_out=len(out_df))
             print(f"  Wrote {out_path} ({len(out_df)} rows)")
             created += 1
         except Exception as e:
@@ -164,7 +174,14 @@ def split_file(path: Path):
 
 
 def main(argv):
-    files = argv[1:]
+    import argparse
+    parser = argparse.ArgumentParser(description='Split Excel files by the "Folder Name" column')
+    parser.add_argument('files', nargs='*', help='Excel files to split (default: %s)' % ', '.join(DEFAULT_FILES))
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv[1:])
+    instrumentation.configure_from_args('split_xlsx_by_folder', args)
+
+    files = args.files
     if not files:
         candidates = DEFAULT_FILES
     else:
@@ -176,6 +193,7 @@ def main(argv):
         for c in candidates:
             print(' ', c)
         print("Place the files in the current directory or the Data/ directory, or pass paths as arguments.")
+        instrumentation.finish()
         return 2
 
     ok = True
@@ -183,6 +201,7 @@ def main(argv):
         res = split_file(f)
         ok = ok and res
 
+    instrumentation.finish()
     return 0 if ok else 1
 
 
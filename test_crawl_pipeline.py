@@ -0,0 +1,80 @@
+import csv
+import threading
+
+import crawl_pipeline
+import instrumentation
+from crawl_state import CrawlState
+from getContactDetails import crawl_query
+
+
+def run_in_thread(timeout=20, **kwargs):
+    """Run the pipeline, failing the test instead of hanging it."""
+    result = {}
+
+    def target():
+        result['summary'] = crawl_pipeline.run_pipeline(fetchers=2, parsers=2, **kwargs)
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'pipeline did not finish'
+    return result['summary']
+
+
+def read_docs(path):
+    with open(path, newline='') as f:
+        return [row[2] for row in csv.reader(f) if len(row) > 2 and row[2] != 'Doc Number']
+
+
+def test_finishes_when_only_query_fails_at_fetch(site, tmp_path):
+    site.add_query('TownA', 'Kumar', [[('D001', '2024-01-02')]])
+    site.set_status('TownA', 'Kumar', 1, 500)
+    state = CrawlState(str(tmp_path / 'state.json'))
+    run_in_thread(townnames=['TownA'], lastnames=['Kumar'], out_dir=str(tmp_path), state=state)
+    assert read_docs(tmp_path / 'TownA.csv') == []
+    assert state.get('TownA', 'Kumar') is None
+
+
+def test_finishes_when_last_query_fails_at_fetch(site, tmp_path):
+    site.add_query('TownA', 'Kumar', [[('D001', '2024-01-02')], [('D002', '2024-01-01')]])
+    site.add_query('TownA', 'Patel', [[('D003', '2024-01-02')]])
+    site.set_status('TownA', 'Patel', 1, 429)
+    state = CrawlState(str(tmp_path / 'state.json'))
+    run_in_thread(townnames=['TownA'], lastnames=['Kumar', 'Patel'], out_dir=str(tmp_path), state=state)
+    assert sorted(read_docs(tmp_path / 'TownA.csv')) == ['D001', 'D002']
+    assert state.get('TownA', 'Kumar')['pages'] == 2
+    assert state.get('TownA', 'Patel') is None
+
+
+def test_failure_on_later_page_is_not_recorded_as_complete(site, tmp_path):
+    site.add_query('TownA', 'Kumar', [[('D001', '2024-01-02')], [('D002', '2024-01-01')]])
+    site.set_status('TownA', 'Kumar', 2, 500)
+    state = CrawlState(str(tmp_path / 'state.json'))
+    run_in_thread(townnames=['TownA'], lastnames=['Kumar'], out_dir=str(tmp_path), state=state)
+    entry = state.get('TownA', 'Kumar')
+    assert entry['docs'] == ['D001'] and 'pages' not in entry
+
+
+def _broken_parse(html):
+    raise ValueError('unparseable page')
+
+
+def test_finishes_when_parse_fails(site, tmp_path, monkeypatch):
+    # the pool forks after the patch, so its workers run the broken parser too
+    monkeypatch.setattr(crawl_pipeline, '_timed_parse', _broken_parse)
+    site.add_query('TownA', 'Kumar', [[('D001', '2024-01-02')]])
+    site.add_query('TownA', 'Patel', [[('D002', '2024-01-02')]])
+    state = CrawlState(str(tmp_path / 'state.json'))
+    run_in_thread(townnames=['TownA'], lastnames=['Kumar', 'Patel'], out_dir=str(tmp_path), state=state)
+    assert read_docs(tmp_path / 'TownA.csv') == []
+    assert state.queries == {}
+
+
+def test_parse_rows_match_sequential_crawl(site, tmp_path):
+    site.add_query('TownA', 'Kumar', [[('D001', '2024-01-03'), ('D002', '2024-01-02')], [('D003', '2024-01-01')]])
+    for _ in crawl_query('TownA', 'Kumar'):
+        pass
+    sequential = instrumentation.current().rows['parse']
+
+    instrumentation.configure('test', trace_memory=False)
+    run_in_thread(townnames=['TownA'], lastnames=['Kumar'], out_dir=str(tmp_path))
+    assert instrumentation.current().rows['parse'] == sequential == {'rows_in': 5, 'rows_out': 5}
@@ -0,0 +1,103 @@
+import csv
+import json
+
+import pytest
+
+import getContactDetails
+from crawl_state import CrawlState
+
+PAGE1 = [('D001', '2024-03-06'), ('D002', '2024-03-05')]
+PAGE2 = [('D003', '2024-03-04'), ('D004', '2024-03-03')]
+PAGE3 = [('D005', '2024-03-02'), ('D006', '2024-03-01')]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    (tmp_path / 'townnames.csv').write_text('TownA\n')
+    (tmp_path / 'lastnames.csv').write_text('Kumar\n')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def crawl(*args):
+    assert getContactDetails.main(list(args)) == 0
+
+
+def docs_in(path):
+    with open(path, newline='') as f:
+        return [row[2] for row in csv.reader(f) if len(row) > 2 and row[2] != 'Doc Number']
+
+
+def state_entry(workdir):
+    return json.loads((workdir / 'crawl_state.json').read_text())['TownA|Kumar']
+
+
+def test_refresh_stops_at_known_documents(site, workdir):
+    site.add_query('TownA', 'Kumar', [PAGE1, PAGE2, PAGE3])
+    crawl()
+    assert state_entry(workdir)['pages'] == 3
+
+    site.add_query('TownA', 'Kumar', [[('N001', '2024-04-01')] + PAGE1, PAGE2, PAGE3])
+    site.requests.clear()
+    crawl('--refresh')
+    assert site.requests == [site.page_url('TownA', 'Kumar'), site.page_url('TownA', 'Kumar', 2)]
+    assert docs_in(workdir / 'TownA.csv') == ['D001', 'D002', 'D003', 'D004', 'D005', 'D006', 'N001']
+
+
+def test_refresh_after_failed_full_crawl_fetches_missing_pages(site, workdir):
+    site.add_query('TownA', 'Kumar', [PAGE1, PAGE2, PAGE3])
+    site.set_status('TownA', 'Kumar', 2, 500)
+    crawl()
+    entry = state_entry(workdir)
+    assert entry['docs'] == ['D001', 'D002'] and 'pages' not in entry
+
+    site.add_query('TownA', 'Kumar', [PAGE1, PAGE2, PAGE3])
+    crawl('--refresh')
+    assert docs_in(workdir / 'TownA.csv') == ['D001', 'D002', 'D003', 'D004', 'D005', 'D006']
+    entry = state_entry(workdir)
+    assert entry['pages'] == 3 and 'incomplete' not in entry
+
+
+def test_refresh_after_failed_refresh_fetches_missing_pages(site, workdir):
+    site.add_query('TownA', 'Kumar', [PAGE1, PAGE2])
+    crawl()
+
+    new = [('N000', '2024-04-05'), ('N001', '2024-04-04'), ('N002', '2024-04-03')]
+    more = [('N003', '2024-04-02'), ('N004', '2024-04-01')]
+    site.add_query('TownA', 'Kumar', [new, more + PAGE1, PAGE2])
+    site.set_status('TownA', 'Kumar', 2, 429)
+    crawl('--refresh')
+    assert state_entry(workdir)['incomplete'] is True
+
+    # page one now holds only documents seen before; the refresh must still page on
+    site.add_query('TownA', 'Kumar', [new, more + PAGE1, PAGE2])
+    crawl('--refresh')
+    assert docs_in(workdir / 'TownA.csv') == ['D001', 'D002', 'D003', 'D004', 'N000', 'N001', 'N002', 'N003', 'N004']
+    assert 'incomplete' not in state_entry(workdir)
+
+
+def test_refresh_without_state_pages_through_and_skips_written_rows(site, workdir):
+    site.add_query('TownA', 'Kumar', [PAGE1, PAGE2])
+    crawl()
+    (workdir / 'crawl_state.json').unlink()
+
+    site.add_query('TownA', 'Kumar', [PAGE1, PAGE2 + [('N001', '2024-01-01')]])
+    crawl('--refresh')
+    assert docs_in(workdir / 'TownA.csv') == ['D001', 'D002', 'D003', 'D004', 'N001']
+
+
+def test_refresh_does_not_stop_at_rows_missing_from_the_csv(site, workdir):
+    site.add_query('TownA', 'Kumar', [PAGE1, PAGE2])
+    crawl()
+    # e.g. an interrupted full crawl truncated the town file after the state was saved
+    (workdir / 'TownA.csv').write_text('')
+    crawl('--refresh')
+    assert docs_in(workdir / 'TownA.csv') == ['D001', 'D002', 'D003', 'D004']
+
+
+def test_failure_without_rows_keeps_last_crawl(tmp_path):
+    state = CrawlState(str(tmp_path / 'state.json'))
+    state.queries['TownA|Kumar'] = {'docs': ['D001'], 'rows': 1, 'pages': 1}
+    tracker = state.track('TownA', 'Kumar', refresh=True)
+    assert tracker.fail() == 0
+    assert state.get('TownA', 'Kumar') == {'docs': ['D001'], 'rows': 1, 'pages': 1}
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import work_queue
+from crawl_state import CrawlState
+from query_planner import plan_queries
+
+STATE = {
+    # Kumaran only returned documents Kumar returned too: verified subsumed
+    'T1|Kumar': {'docs': ['1', '2'], 'rows': 2, 'pages': 1},
+    'T1|Kumaran': {'docs': ['1'], 'rows': 1, 'pages': 1},
+    # Patelx returned a document Patel did not
+    'T1|Patel': {'docs': ['3'], 'rows': 1, 'pages': 1},
+    'T1|Patelx': {'docs': ['3', '4'], 'rows': 2, 'pages': 1},
+    # an empty result proves nothing about subsumption
+    'T1|Shah': {'docs': ['5'], 'rows': 1, 'pages': 1},
+    'T1|Shahi': {'docs': [], 'rows': 0, 'pages': 0},
+    # Zed returned nothing in T1 and was never crawled in T2
+    'T1|Zed': {'docs': [], 'rows': 0, 'pages': 0},
+    # Lee: a failed attempt only in T1, nothing found in T2
+    'T1|Lee': {'docs': [], 'newest': None},
+    'T2|Lee': {'docs': [], 'rows': 0, 'pages': 0},
+}
+LASTNAMES = ['Kumar', 'Kumaran', 'Patel', 'Patelx', 'Shah', 'Shahi', 'Zed', 'Lee', 'Leeds']
+
+
+@pytest.fixture
+def state(tmp_path):
+    path = tmp_path / 'crawl_state.json'
+    path.write_text(json.dumps(STATE))
+    return CrawlState(str(path))
+
+
+def decisions(plan, town):
+    result = {name: 'run' for name in plan['queries'][town]}
+    result.update({name: 'defer' for t, name, _ in plan['deferred'] if t == town})
+    result.update({name: 'skip' for t, name, _ in plan['skipped'] if t == town})
+    return result
+
+
+def test_skip_and_defer_decisions(state):
+    plan = plan_queries(['T1', 'T2'], LASTNAMES, state)
+    assert decisions(plan, 'T1') == {
+        'Kumar': 'run', 'Kumaran': 'skip', 'Patel': 'run', 'Patelx': 'run', 'Shah': 'run', 'Shahi': 'defer',
+        'Zed': 'defer', 'Lee': 'defer', 'Leeds': 'defer'}
+    # no stats in T2 for the longer names: containment alone only defers them
+    assert decisions(plan, 'T2') == {
+        'Kumar': 'run', 'Kumaran': 'defer', 'Patel': 'run', 'Patelx': 'defer', 'Shah': 'run', 'Shahi': 'defer',
+        'Zed': 'defer', 'Lee': 'defer', 'Leeds': 'defer'}
+    assert plan['queries']['T1'][:2] == ['Kumar', 'Patelx']  # highest expected rows first
+
+
+def test_trust_containment_skips_unverified(state):
+    plan = plan_queries(['T1', 'T2'], LASTNAMES, state, trust_containment=True)
+    assert decisions(plan, 'T2')['Patelx'] == 'skip'
+    assert decisions(plan, 'T1')['Shahi'] == 'defer'
+    assert decisions(plan, 'T1')['Patelx'] == 'run'
+
+
+def test_skip_zero_needs_every_town(state):
+    plan = plan_queries(['T1', 'T2'], LASTNAMES, state, skip_zero=True)
+    assert decisions(plan, 'T1')['Zed'] == 'defer'
+    assert decisions(plan, 'T2')['Zed'] == 'defer'
+    # T1 only has a failed attempt at Lee, which does not count
+    assert decisions(plan, 'T1')['Lee'] == 'defer'
+    plan = plan_queries(['T1'], LASTNAMES, state, skip_zero=True)
+    assert decisions(plan, 'T1')['Zed'] == 'skip'
+
+
+def test_substring_match(state):
+    plan = plan_queries(['T1'], ['Kumar', 'Kumaran', 'Aran'], state, match='substring')
+    assert decisions(plan, 'T1')['Kumaran'] == 'skip'
+    plan = plan_queries(['T1'], ['Aran', 'Kumaran'], state)
+    assert decisions(plan, 'T1')['Kumaran'] == 'run'
+
+
+def test_enqueue_plan_passes_planner_options(state, tmp_path):
+    (tmp_path / 'towns.csv').write_text('T1\n')
+    (tmp_path / 'lastnames.csv').write_text('Zed\nLee\n')
+    db = str(tmp_path / 'queue.db')
+    args = ['enqueue', '--db', db, '--towns', str(tmp_path / 'towns.csv'),
+            '--lastnames', str(tmp_path / 'lastnames.csv'), '--plan', '--state', state.path]
+    assert work_queue.main(args + ['--skip-zero']) == 0
+    queue = work_queue.SqliteQueue(db)
+    assert [queue.claim('w1')['lastname'], queue.claim('w1')] == ['Lee', None]
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+import work_queue
+from work_queue import RemoteQueue, SqliteQueue, make_coordinator
+
+
+def make_queue(tmp_path, **kwargs):
+    queue = SqliteQueue(str(tmp_path / 'queue.db'), **kwargs)
+    queue.enqueue(['TownA'], ['Kumar', 'Patel'])
+    return queue
+
+
+def test_expired_lease_is_reclaimed_and_late_complete_rejected(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.claim('w1', lease_seconds=0.05)
+    assert first['lastname'] == 'Kumar' and first['attempt'] == 1
+    time.sleep(0.1)
+
+    second = queue.claim('w2', lease_seconds=60)
+    assert second['id'] == first['id'] and second['attempt'] == 2
+    assert not queue.heartbeat(first['id'], 'w1')
+    assert not queue.complete(first['id'], 'w1', [['late row']])
+    assert queue.complete(second['id'], 'w2', [['row']])
+    assert [row for _, row in queue.iter_results()] == [['row']]
+    assert queue.status()['done'] == 1
+
+
+def test_heartbeat_keeps_lease(tmp_path):
+    queue = make_queue(tmp_path)
+    job = queue.claim('w1', lease_seconds=0.2)
+    time.sleep(0.1)
+    assert queue.heartbeat(job['id'], 'w1', lease_seconds=60)
+    time.sleep(0.15)
+    assert queue.claim('w2')['id'] != job['id']
+
+
+def test_lease_expiring_too_often_parks_job(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=1)
+    job = queue.claim('w1', lease_seconds=0.01)
+    time.sleep(0.05)
+    assert queue.claim('w2')['id'] != job['id']
+    assert queue.status()['failed'] == 1
+
+
+def test_failed_job_waits_before_retry(tmp_path):
+    queue = make_queue(tmp_path, retry_delay=0.2)
+    job = queue.claim('w1')
+    assert queue.fail(job['id'], 'w1', 'HTTPError: 429')
+    # the other job is claimed first; the failed one only once its delay has passed
+    assert queue.claim('w1')['id'] != job['id']
+    assert queue.claim('w1') is None
+    assert queue.status()['retry_waiting'] == 1
+    time.sleep(0.25)
+    retry = queue.claim('w1')
+    assert retry['id'] == job['id'] and retry['attempt'] == 2
+
+
+def test_retry_delay_doubles_and_is_capped(tmp_path):
+    queue = make_queue(tmp_path, retry_delay=10, max_retry_delay=25)
+    conn = queue._conn()
+    delays = []
+    for _ in range(3):
+        job = queue.claim('w1')
+        assert job['lastname'] == 'Kumar'
+        before = time.time()
+        queue.fail(job['id'], 'w1', 'timeout')
+        delays.append(round(conn.execute('SELECT not_before FROM jobs WHERE id = ?', (job['id'],)).fetchone()[0]
+                            - before))
+        conn.execute('UPDATE jobs SET not_before = NULL WHERE id = ?', (job['id'],))
+    assert delays == [10, 20, 25]
+
+
+def test_requeue_failed_and_export_reports_failures(tmp_path, capsys):
+    db = str(tmp_path / 'queue.db')
+    queue = SqliteQueue(db, max_attempts=1, retry_delay=0)
+    queue.enqueue(['TownA'], ['Kumar'])
+    job = queue.claim('w1')
+    queue.fail(job['id'], 'w1', 'HTTPError: 500')
+    assert queue.status()['failed'] == 1
+
+    assert work_queue.main(['export', '--db', db, '--out', str(tmp_path)]) == 1
+    assert '1 jobs failed' in capsys.readouterr().out
+
+    assert queue.requeue_failed() == 1
+    job = queue.claim('w1')
+    assert job['attempt'] == 1
+    assert queue.complete(job['id'], 'w1', [['row']])
+    assert work_queue.main(['export', '--db', db, '--out', str(tmp_path)]) == 0
+    assert (tmp_path / 'TownA.csv').read_text().strip() == 'row'
+
+
+def test_coordinator_requires_token(tmp_path):
+    with pytest.raises(ValueError):
+        make_coordinator(SqliteQueue(str(tmp_path / 'other.db')), '0.0.0.0', 0)
+
+    queue = make_queue(tmp_path)
+    server = make_coordinator(queue, '127.0.0.1', 0, token='s3cret')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        for token in (None, 'wrong'):
+            with pytest.raises(RuntimeError, match='X-Queue-Token'):
+                RemoteQueue(url, token=token).claim('w1')
+        job = RemoteQueue(url, token='s3cret').claim('w1')
+        assert job['lastname'] == 'Kumar'
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert queue.status()['leased'] == 1
@@ -0,0 +1,499 @@
+"""
+Lease-based work queue for spreading the (town x lastname) crawl over several machines.
+
+A coordinator owns a SQLite file holding one job per (town, lastname) query. Workers
+claim a job with a time-limited lease, heartbeat while they crawl, and push the result
+rows back. A job whose lease runs out (worker crashed, lost network) goes back to the
+pool and is claimed again. Results are accepted only from the worker that currently
+holds the lease, so a query is never lost and its rows are never stored twice.
+
+A job that fails (HTTP error, timeout) is retried after a delay that doubles with every
+attempt (--retry-delay, capped at --max-retry-delay), so a burst of 429s or a short
+outage does not use up --max-attempts within seconds. Jobs that still run out of
+attempts are parked as failed; `requeue-failed` puts them back once the site is
+reachable again, and `export` refuses to pass silently while any remain.
+
+Workers on the same machine can open the SQLite file directly (--db). Workers on other
+machines talk to `work_queue.py serve`, which exposes the same operations over HTTP
+(--coordinator http://host:port). SQLite locking is not reliable on network
+filesystems, so do not share the file itself over NFS/SMB.
+
+The coordinator listens on 127.0.0.1 by default. Anyone who can reach it can claim jobs
+and store rows that end up in the exported town files, so binding it to another
+interface requires a shared token (--token or $WORK_QUEUE_TOKEN). Workers send it in an
+X-Queue-Token header, and requests without it are rejected.
+
+Usage:
+  python work_queue.py enqueue --db crawl.db [--towns townnames.csv] [--lastnames lastnames.csv]
+                               [--plan [--match prefix|substring] [--trust-containment] [--skip-zero]]
+  python work_queue.py serve   --db crawl.db [--host 127.0.0.1] [--port 8766] [--token SECRET]
+  python work_queue.py work    --coordinator http://coordinator:8766 --token SECRET [--worker-id NAME] [--exit-when-empty]
+  python work_queue.py work    --db crawl.db
+  python work_queue.py status  --db crawl.db
+  python work_queue.py requeue-failed --db crawl.db
+  python work_queue.py export  --db crawl.db [--out .]     (writes <town>.csv like getContactDetails.py)
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import csv
+import hmac
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+import instrumentation
+
+DEFAULT_DB = 'crawl_queue.db'
+DEFAULT_LEASE = 120  # seconds
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 30  # seconds before the first retry; doubles with every attempt
+DEFAULT_MAX_RETRY_DELAY = 1800
+TOKEN_HEADER = 'X-Queue-Token'
+TOKEN_ENV = 'WORK_QUEUE_TOKEN'
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    town TEXT NOT NULL,
+    lastname TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',   -- pending, leased, done, failed
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    not_before REAL,                          -- a failed job is not claimed again before this time
+    updated REAL,
+    UNIQUE (town, lastname)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    seq INTEGER NOT NULL,
+    row TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class SqliteQueue:
+    """Queue operations on a local SQLite file. Safe to share between threads;
+    each thread gets its own connection."""
+
+    def __init__(self, path=DEFAULT_DB, max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=DEFAULT_RETRY_DELAY,
+                 max_retry_delay=DEFAULT_MAX_RETRY_DELAY):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        # queue files created before retries were delayed
+        if 'not_before' not in {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}:
+            conn.execute('ALTER TABLE jobs ADD COLUMN not_before REAL')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    def enqueue(self, towns, lastnames, queries=None):
+        """Add one job per (town, lastname), or per pair in `queries` when given, in
+        claim order. Existing jobs are left alone. Returns the number added."""
+        now = time.time()
+        if queries is None:
+            queries = [(town, lastname) for town in towns for lastname in lastnames]
+
+        def run(conn):
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO jobs (town, lastname, updated) VALUES (?, ?, ?)',
+                             [(town, lastname, now) for town, lastname in queries])
+            return conn.total_changes - before
+        return self._write(run)
+
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE):
+        """Lease the next pending (or expired) job to worker_id. Returns a job dict or None."""
+        def run(conn):
+            now = time.time()
+            # expired leases that already used up their attempts are parked as failed
+            conn.execute("UPDATE jobs SET status = 'failed', owner = NULL, error = 'lease expired too often', updated = ? "
+                         "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                         (now, now, self.max_attempts))
+            row = conn.execute("SELECT id, town, lastname, attempts FROM jobs "
+                               "WHERE (status = 'pending' AND (not_before IS NULL OR not_before <= ?)) "
+                               "OR (status = 'leased' AND lease_expires < ?) "
+                               "ORDER BY id LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                         "updated = ? WHERE id = ?", (worker_id, now + lease_seconds, now, row['id']))
+            return {'id': row['id'], 'town': row['town'], 'lastname': row['lastname'],
+                    'attempt': row['attempts'] + 1, 'lease_seconds': lease_seconds}
+        return self._write(run)
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=DEFAULT_LEASE):
+        """Extend the lease. Returns False if the job is no longer leased to worker_id."""
+        now = time.time()
+
+        def run(conn):
+            cur = conn.execute("UPDATE jobs SET lease_expires = ?, updated = ? "
+                               "WHERE id = ? AND owner = ? AND status = 'leased'",
+                               (now + lease_seconds, now, job_id, worker_id))
+            return cur.rowcount == 1
+        return self._write(run)
+
+    def complete(self, job_id, worker_id, rows):
+        """Store the result rows and mark the job done. Rejected (returns False) if
+        the lease has been taken over by another worker."""
+        def run(conn):
+            owner = conn.execute("SELECT owner FROM jobs WHERE id = ? AND status = 'leased'", (job_id,)).fetchone()
+            if owner is None or owner['owner'] != worker_id:
+                return False
+            conn.executemany('INSERT INTO results (job_id, seq, row) VALUES (?, ?, ?)',
+                             [(job_id, i, json.dumps(row)) for i, row in enumerate(rows)])
+            conn.execute("UPDATE jobs SET status = 'done', owner = NULL, lease_expires = NULL, error = NULL, "
+                         "updated = ? WHERE id = ?", (time.time(), job_id))
+            return True
+        return self._write(run)
+
+    def fail(self, job_id, worker_id, error):
+        """Give the job back after an error. It is retried after retry_delay * 2^(attempts - 1)
+        seconds (at most max_retry_delay), until max_attempts."""
+        def run(conn):
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND owner = ? AND status = 'leased'",
+                               (job_id, worker_id)).fetchone()
+            if row is None:
+                return False
+            now = time.time()
+            delay = min(self.retry_delay * 2 ** max(row['attempts'] - 1, 0), self.max_retry_delay)
+            status = 'failed' if row['attempts'] >= self.max_attempts else 'pending'
+            conn.execute("UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL, error = ?, not_before = ?, "
+                         "updated = ? WHERE id = ?", (status, str(error)[:500], now + delay, now, job_id))
+            return True
+        return self._write(run)
+
+    def requeue_failed(self):
+        """Put failed jobs back as pending with fresh attempts. Returns how many."""
+        def run(conn):
+            cur = conn.execute("UPDATE jobs SET status = 'pending', attempts = 0, not_before = NULL, updated = ? "
+                               "WHERE status = 'failed'", (time.time(),))
+            return cur.rowcount
+        return self._write(run)
+
+    def status(self):
+        conn = self._conn()
+        counts = {row['status']: row['n'] for row in conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status')}
+        now = time.time()
+        counts['expired'] = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires < ?",
+                                         (now,)).fetchone()[0]
+        counts['retry_waiting'] = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending' AND not_before > ?",
+                                               (now,)).fetchone()[0]
+        counts['result_rows'] = conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return counts
+
+    def iter_results(self):
+        """Yield (town, row) for every stored row in enqueue order."""
+        conn = self._conn()
+        for r in conn.execute('SELECT j.town, r.row FROM results r JOIN jobs j ON j.id = r.job_id '
+                              'ORDER BY r.job_id, r.seq'):
+            yield r['town'], json.loads(r['row'])
+
+
+class RemoteQueue:
+    """Same operations as SqliteQueue, sent to `work_queue.py serve` over HTTP."""
+
+    def __init__(self, url, timeout=60, token=None):
+        parts = urlsplit(url if '://' in url else f'http://{url}')
+        self.host = parts.hostname
+        self.port = parts.port or 8766
+        self.timeout = timeout
+        self.headers = {TOKEN_HEADER: token} if token else {}
+
+    def _call(self, op, **payload):
+        from worker_service import call
+        result = call(f'/{op}', payload, self.host, self.port, timeout=self.timeout, headers=self.headers)
+        if not isinstance(result, dict):
+            raise RuntimeError(f'coordinator {op} failed: unexpected response {result!r:.200}')
+        if 'error' in result:
+            raise RuntimeError(f'coordinator {op} failed: {result["error"]}')
+        return result['result']
+
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE):
+        return self._call('claim', worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=DEFAULT_LEASE):
+        return self._call('heartbeat', job_id=job_id, worker_id=worker_id, lease_seconds=lease_seconds)
+
+    def complete(self, job_id, worker_id, rows):
+        return self._call('complete', job_id=job_id, worker_id=worker_id, rows=rows)
+
+    def fail(self, job_id, worker_id, error):
+        return self._call('fail', job_id=job_id, worker_id=worker_id, error=error)
+
+    def status(self):
+        return self._call('status')
+
+
+QUEUE_OPS = ('claim', 'heartbeat', 'complete', 'fail', 'status')
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    server_version = 'webscraping-coordinator/1.0'
+    queue = None  # set by make_coordinator
+    token = None
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        if not self.token:
+            return True
+        if hmac.compare_digest(self.headers.get(TOKEN_HEADER, '').encode('utf-8'), self.token.encode('utf-8')):
+            return True
+        self._send(401, {'error': f'missing or wrong {TOKEN_HEADER} header'})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == '/status':
+            self._send(200, {'result': self.queue.status()})
+        else:
+            self._send(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        op = self.path.strip('/')
+        if op not in QUEUE_OPS:
+            self._send(404, {'error': f'unknown path {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            result = getattr(self.queue, op)(**payload)
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        except sqlite3.Error as e:
+            self._send(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        self._send(200, {'result': result})
+
+    def log_request(self, code='-', size='-'):
+        # heartbeats would flood the console; only log failed requests
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+
+
+def make_coordinator(queue, host='127.0.0.1', port=8766, token=None):
+    """HTTP server for `queue`. Refuses to listen beyond loopback without a token."""
+    if not token and host not in LOOPBACK_HOSTS:
+        raise ValueError(f'a token is required to serve on {host}; pass --token or set ${TOKEN_ENV}')
+    handler = type('BoundCoordinatorHandler', (CoordinatorHandler,), {'queue': queue, 'token': token})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class Heartbeat(threading.Thread):
+    """Keeps a lease alive while the main thread crawls."""
+
+    def __init__(self, queue, job, worker_id):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        lease = self.job['lease_seconds']
+        while not self._stop_event.wait(lease / 3):
+            try:
+                if not self.queue.heartbeat(self.job['id'], self.worker_id, lease):
+                    self.lost = True
+                    return
+            except Exception as e:
+                # keep trying; the lease only lapses if we stay unreachable for a whole period
+                print(f"Heartbeat failed for job {self.job['id']}: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def work(queue, worker_id, lease_seconds=DEFAULT_LEASE, poll_seconds=10, exit_when_empty=False):
+    """Claim and run jobs until the queue is empty (exit_when_empty) or forever."""
+    from getContactDetails import crawl_query
+    done = 0
+    while True:
+        job = queue.claim(worker_id, lease_seconds)
+        if job is None:
+            if exit_when_empty:
+                break
+            time.sleep(poll_seconds)
+            continue
+        print(f"[{worker_id}] job {job['id']}: {job['lastname']} in {job['town']} (attempt {job['attempt']})")
+        heartbeat = Heartbeat(queue, job, worker_id)
+        heartbeat.start()
+        try:
+            rows = [row for page in crawl_query(job['town'], job['lastname']) for row in page]
+        except Exception as e:
+            heartbeat.stop()
+            print(f"[{worker_id}] job {job['id']} failed: {e}")
+            queue.fail(job['id'], worker_id, f'{type(e).__name__}: {e}')
+            continue
+        heartbeat.stop()
+        if heartbeat.lost or not queue.complete(job['id'], worker_id, rows):
+            print(f"[{worker_id}] lease on job {job['id']} was lost; another worker will redo it")
+            continue
+        instrumentation.count_rows('job', rows_in=1, rows_out=len(rows))
+        done += 1
+    return done
+
+
+def export(queue, out_dir='.'):
+    """Write <town>.csv files with the stored rows, like getContactDetails.py does."""
+    files = {}
+    try:
+        for town, row in queue.iter_results():
+            if town not in files:
+                f = open(os.path.join(out_dir, f'{town}.csv'), 'w', newline='')
+                files[town] = (f, csv.writer(f))
+            files[town][1].writerow(row)
+    finally:
+        for f, _ in files.values():
+            f.close()
+    return sorted(files)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Lease-based work queue for the (town x lastname) crawl')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_enqueue = sub.add_parser('enqueue', help='Add (town, lastname) jobs')
+    p_enqueue.add_argument('--towns', default='townnames.csv')
+    p_enqueue.add_argument('--lastnames', default='lastnames.csv')
+    p_enqueue.add_argument('--plan', action='store_true', help='Enqueue only the queries kept by query_planner.py')
+    p_enqueue.add_argument('--state', default='crawl_state.json', help='Crawl state used by --plan')
+    p_enqueue.add_argument('--match', choices=('prefix', 'substring'), default='prefix',
+                           help='How the site search matches names, for --plan (default: %(default)s)')
+    p_enqueue.add_argument('--trust-containment', action='store_true',
+                           help='With --plan, skip contained names even without past results to verify them')
+    p_enqueue.add_argument('--skip-zero', action='store_true',
+                           help='With --plan, skip names whose completed crawls returned nothing in every town')
+
+    p_serve = sub.add_parser('serve', help='Expose the queue to remote workers over HTTP')
+    p_serve.add_argument('--host', default='127.0.0.1',
+                         help='Interface to listen on; anything but loopback needs --token (default: %(default)s)')
+    p_serve.add_argument('--port', type=int, default=8766)
+
+    p_work = sub.add_parser('work', help='Claim and crawl jobs')
+    p_work.add_argument('--coordinator', help='http://host:port of `work_queue.py serve` (instead of --db)')
+    p_work.add_argument('--worker-id', default=f'{socket.gethostname()}-{os.getpid()}')
+    p_work.add_argument('--lease', type=float, default=DEFAULT_LEASE, help='Lease length in seconds (default: %(default)s)')
+    p_work.add_argument('--poll', type=float, default=10, help='Seconds to wait when no job is available')
+    p_work.add_argument('--exit-when-empty', action='store_true')
+    instrumentation.add_arguments(p_work)
+
+    sub.add_parser('status', help='Show job counts')
+    sub.add_parser('requeue-failed', help='Retry jobs that ran out of attempts')
+
+    p_export = sub.add_parser('export', help='Write <town>.csv files from the stored results')
+    p_export.add_argument('--out', default='.')
+
+    for p in (p_serve, p_work):
+        p.add_argument('--token', default=os.environ.get(TOKEN_ENV),
+                       help=f'Shared secret between coordinator and workers (default: ${TOKEN_ENV})')
+    for p in sub.choices.values():
+        p.add_argument('--db', default=DEFAULT_DB, help='SQLite queue file (default: %(default)s)')
+        p.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+        p.add_argument('--retry-delay', type=float, default=DEFAULT_RETRY_DELAY,
+                       help='Seconds before a failed job is retried; doubles per attempt (default: %(default)s)')
+        p.add_argument('--max-retry-delay', type=float, default=DEFAULT_MAX_RETRY_DELAY,
+                       help='Upper bound for the retry delay in seconds (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'work' and args.coordinator:
+        queue = RemoteQueue(args.coordinator, token=args.token)
+    else:
+        queue = SqliteQueue(args.db, args.max_attempts, args.retry_delay, args.max_retry_delay)
+
+    if args.command == 'enqueue':
+        from getContactDetails import read_csv_list
+        towns, lastnames = read_csv_list(args.towns), read_csv_list(args.lastnames)
+        queries = None
+        if args.plan:
+            from crawl_state import CrawlState
+            from query_planner import plan_queries, print_plan
+            plan = plan_queries(towns, lastnames, CrawlState(args.state), args.match, args.trust_containment,
+                                args.skip_zero)
+            print_plan(plan)
+            queries = [(town, lastname) for town in towns for lastname in plan['queries'][town]]
+        added = queue.enqueue(towns, lastnames, queries)
+        print(f'Enqueued {added} new jobs; {queue.status()}')
+    elif args.command == 'serve':
+        try:
+            server = make_coordinator(queue, args.host, args.port, args.token)
+        except ValueError as e:
+            print(f'Error: {e}')
+            return 2
+        print(f'Coordinator for {args.db} listening on http://{args.host}:{args.port}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    elif args.command == 'work':
+        instrumentation.configure_from_args('work_queue', args)
+        done = work(queue, args.worker_id, args.lease, args.poll, args.exit_when_empty)
+        print(f'[{args.worker_id}] completed {done} jobs')
+        instrumentation.finish()
+    elif args.command == 'status':
+        print(json.dumps(queue.status(), indent=2))
+    elif args.command == 'requeue-failed':
+        print(f'Requeued {queue.requeue_failed()} failed jobs')
+    elif args.command == 'export':
+        towns = export(queue, args.out)
+        print(f'Wrote {len(towns)} town files to {args.out}')
+        counts = queue.status()
+        unfinished = counts.get('pending', 0) + counts.get('leased', 0)
+        if unfinished:
+            print(f'Warning: {unfinished} jobs are not finished yet; their rows are missing from the export')
+        if counts.get('failed'):
+            print(f"Error: {counts['failed']} jobs failed and their rows are missing from the export; "
+                  f"run `work_queue.py requeue-failed` and crawl them again")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,330 @@
+"""
+Long-running local worker that keeps lookups warm between requests.
+
+Every script run pays for importing pandas/shapely/bs4 and rebuilding the lastname
+set, clustering CSV maps, geocode cache and boundary polygon. This service loads
+each of those once (and again only when the file on disk changes) and answers
+JSON requests over HTTP on localhost or a Unix socket.
+
+Endpoints (POST bodies and responses are JSON):
+- GET  /health           loaded structures and their sizes
+- GET  /metrics          Prometheus text of the cache/row counters
+- POST /filter-lastnames {"rows": [{"1st Grantor": ..., "1st Grantee": ...}], "lastnames": "lastnames_new.csv"}
+                         -> {"rows": [... rows that match, with "Matched Lastname"], "matched": n}
+- POST /geocode          {"addresses": [...], "network": true}
+                         -> {"results": [{"address", "lon", "lat", "source"}]}
+                         source is clustering, cache, nominatim or null when not found
+- POST /points-in-area   {"points": [[lon, lat], ...] or [{"lon", "lat", ...}], "boundary": "Data/area.kml"}
+                         -> {"inside": [indices into points], "count": n}
+- POST /reload           drop every warm structure
+
+Usage:
+  python worker_service.py serve [--host 127.0.0.1] [--port 8765]
+  python worker_service.py serve --socket /tmp/webscraping.sock
+  python worker_service.py call /geocode '{"addresses": ["5 BOLAND DR, BARRINGTON"]}' [--socket PATH]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http.client
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import instrumentation
+
+DEFAULT_LASTNAMES = 'lastnames_new.csv'
+DEFAULT_BOUNDARY = 'Data/DesPlainesKendraArea.kml'
+DEFAULT_CLUSTERING_CSV = 'Data/Desplaines Clustering.csv'
+DEFAULT_GEOCODE_CACHE = 'geocode_cache.json'
+GEOCODE_INTERVAL = 1.1  # seconds between Nominatim requests, as in FindPointsInArea.py
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class WarmState:
+    """Lookups loaded on first use and kept until their source file changes."""
+
+    def __init__(self, clustering_csv=DEFAULT_CLUSTERING_CSV, geocode_cache=DEFAULT_GEOCODE_CACHE, email=None):
+        self.clustering_csv = clustering_csv
+        self.geocode_cache_path = geocode_cache
+        self.email = email
+        self._lock = threading.Lock()
+        self._geocode_lock = threading.Lock()
+        self._last_geocode = 0.0
+        self._loaded = {}  # key -> (mtime, value)
+
+    def _get(self, key, path, load):
+        mtime = _mtime(path)
+        with self._lock:
+            cached = self._loaded.get(key)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        value = load()
+        with self._lock:
+            self._loaded[key] = (mtime, value)
+        return value
+
+    def reload(self):
+        with self._lock:
+            self._loaded.clear()
+
+    def lastnames(self, path=DEFAULT_LASTNAMES):
+        from CleanupData import prepare_lastnames, read_csv_list
+        return self._get(('lastnames', path), path, lambda: prepare_lastnames(set(read_csv_list(path))))
+
+    def clustering_maps(self):
+        from FindPointsInArea import load_clustering_csv
+        return self._get(('clustering', self.clustering_csv), self.clustering_csv,
+                         lambda: load_clustering_csv(self.clustering_csv))
+
+    def boundary(self, path=DEFAULT_BOUNDARY):
+        def load():
+            from shapely.prepared import prep
+            from FindPointsInArea import get_boundary_polygon
+            polygon = get_boundary_polygon(path)
+            return polygon, prep(polygon)
+        return self._get(('boundary', path), path, load)
+
+    def geocode_cache(self):
+        # the cache is mutated in place and saved by us, so it is loaded only once
+        with self._lock:
+            cached = self._loaded.get('geocode_cache')
+        if cached:
+            return cached[1]
+        from FindPointsInArea import load_geocode_cache
+        cache = load_geocode_cache(self.geocode_cache_path)
+        with self._lock:
+            return self._loaded.setdefault('geocode_cache', (None, cache))[1]
+
+    def summary(self):
+        with self._lock:
+            loaded = dict(self._loaded)
+        out = {}
+        for key, (mtime, value) in loaded.items():
+            name = key if isinstance(key, str) else f'{key[0]}:{key[1]}'
+            if key == 'geocode_cache':
+                size = len(value)
+            elif key[0] == 'clustering':
+                size = {'by_name': len(value[0]), 'by_addr': len(value[1])}
+            elif key[0] == 'boundary':
+                size = len(value[0].exterior.coords)
+            else:
+                size = len(value)
+            out[name] = size
+        return out
+
+    # -- operations ---------------------------------------------------------
+
+    def filter_lastnames(self, rows, lastnames_path=DEFAULT_LASTNAMES):
+        from CleanupData import match_lastname
+        prepared = self.lastnames(lastnames_path)
+        kept = []
+        for row in rows:
+            name = match_lastname(row.get('1st Grantor', ''), row.get('1st Grantee', ''), prepared)
+            if name:
+                kept.append(dict(row, **{'Matched Lastname': name}))
+        instrumentation.count_rows('filter_lastnames', rows_in=len(rows), rows_out=len(kept))
+        return kept
+
+    def geocode(self, addresses, network=True):
+        from FindPointsInArea import geocode_address, normalize_address, save_geocode_cache
+        _, by_addr = self.clustering_maps()
+        cache = self.geocode_cache()
+        results = []
+        added = False
+        for addr in addresses:
+            lon = lat = source = None
+            hit = by_addr.get(normalize_address(addr)) if addr else None
+            if hit:
+                lon, lat = hit
+                source = 'clustering'
+                instrumentation.cache_hit('clustering_csv')
+            elif addr in cache:
+                lon, lat = cache[addr]
+                source = 'cache' if lon is not None else None
+                instrumentation.cache_hit('geocode_cache')
+            elif addr and network:
+                with self._geocode_lock:
+                    wait = self._last_geocode + GEOCODE_INTERVAL - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                    lon, lat = geocode_address(addr, cache, email=self.email)
+                    self._last_geocode = time.monotonic()
+                source = 'nominatim' if lon is not None else None
+                added = True
+            results.append({'address': addr, 'lon': lon, 'lat': lat, 'source': source})
+        if added:
+            with self._geocode_lock:
+                save_geocode_cache(self.geocode_cache_path, cache)
+        return results
+
+    def points_in_area(self, points, boundary_path=DEFAULT_BOUNDARY):
+        from FindPointsInArea import filter_points_in_boundary
+        polygon, prepared = self.boundary(boundary_path)
+        placemarks = []
+        for i, pt in enumerate(points):
+            if isinstance(pt, dict):
+                placemarks.append({'index': i, 'lon': pt.get('lon'), 'lat': pt.get('lat')})
+            else:
+                placemarks.append({'index': i, 'lon': pt[0], 'lat': pt[1]})
+        inside = filter_points_in_boundary(placemarks, polygon, prepared=prepared, verbose=False)
+        instrumentation.count_rows('points_in_area', rows_in=len(points), rows_out=len(inside))
+        return [p['index'] for p in inside]
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'webscraping-worker/1.0'
+    state = None  # set by make_server
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def _send(self, status, payload, content_type='application/json'):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok', 'loaded': self.state.summary()})
+        elif self.path == '/metrics':
+            self._send(200, instrumentation.current().prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            self._send(400, {'error': f'invalid JSON body: {e}'})
+            return
+        start = time.perf_counter()
+        try:
+            if self.path == '/filter-lastnames':
+                rows = self.state.filter_lastnames(payload.get('rows', []), payload.get('lastnames', DEFAULT_LASTNAMES))
+                result = {'rows': rows, 'matched': len(rows)}
+            elif self.path == '/geocode':
+                result = {'results': self.state.geocode(payload.get('addresses', []), payload.get('network', True))}
+            elif self.path == '/points-in-area':
+                inside = self.state.points_in_area(payload.get('points', []), payload.get('boundary', DEFAULT_BOUNDARY))
+                result = {'inside': inside, 'count': len(inside)}
+            elif self.path == '/reload':
+                self.state.reload()
+                result = {'status': 'reloaded'}
+            else:
+                self._send(404, {'error': f'unknown path {self.path}'})
+                return
+        except FileNotFoundError as e:
+            self._send(404, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        self._send(200, result)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(state, host='127.0.0.1', port=8765, socket_path=None):
+    handler = type('BoundHandler', (Handler,), {'state': state})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def call(path, payload=None, host='127.0.0.1', port=8765, socket_path=None, timeout=60, headers=None):
+    """Send one request to a running worker and return the decoded response."""
+    conn = UnixHTTPConnection(socket_path, timeout) if socket_path else http.client.HTTPConnection(host, port, timeout=timeout)
+    headers = dict(headers or {})
+    try:
+        if payload is None:
+            conn.request('GET', path, headers=headers)
+        else:
+            headers['Content-Type'] = 'application/json'
+            conn.request('POST', path, body=json.dumps(payload), headers=headers)
+        resp = conn.getresponse()
+        body = resp.read().decode('utf-8')
+    finally:
+        conn.close()
+    if resp.getheader('Content-Type', '').startswith('application/json'):
+        return json.loads(body)
+    return body
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Local worker service with warm lastname, geocode and boundary lookups')
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help='Run the worker')
+    serve.add_argument('--clustering-csv', default=DEFAULT_CLUSTERING_CSV)
+    serve.add_argument('--geocode-cache', default=DEFAULT_GEOCODE_CACHE)
+    serve.add_argument('--email', help='Contact email sent to Nominatim')
+    serve.add_argument('--preload', action='store_true', help='Load the default lookups before accepting requests')
+    client = sub.add_parser('call', help='Send one request to a running worker')
+    client.add_argument('path', help='e.g. /health or /geocode')
+    client.add_argument('payload', nargs='?', help='JSON body; omit for a GET request')
+    for p in (serve, client):
+        p.add_argument('--host', default='127.0.0.1')
+        p.add_argument('--port', type=int, default=8765)
+        p.add_argument('--socket', help='Unix socket path instead of host/port')
+    args = parser.parse_args(argv)
+
+    if args.command == 'call':
+        payload = json.loads(args.payload) if args.payload else None
+        result = call(args.path, payload, args.host, args.port, args.socket)
+        print(result if isinstance(result, str) else json.dumps(result, indent=2))
+        return 0
+
+    instrumentation.configure('worker_service', trace_memory=False)
+    state = WarmState(args.clustering_csv, args.geocode_cache, args.email)
+    if args.preload:
+        for load in (state.lastnames, state.clustering_maps, state.geocode_cache, state.boundary):
+            try:
+                load()
+            except Exception as e:
+                print(f'Preload skipped {load.__name__}: {e}')
+    server = make_server(state, args.host, args.port, args.socket)
+    where = args.socket or f'http://{args.host}:{args.port}'
+    print(f'Worker listening on {where}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))